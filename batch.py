@@ -0,0 +1,95 @@
+import os
+import json
+import time
+import argparse
+from multiprocessing import Pool
+
+# Batch races are always headless
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+from main import MarbleRaceGame, FPS
+
+
+def run_race(task):
+    # Runs in a worker process; returns only small tuples to keep IPC cheap
+    seed, engine, max_ticks, until_all_finished = task
+    game = MarbleRaceGame(engine=engine, headless=True, seed=seed)
+    results = game.run_headless(max_ticks=max_ticks, until_all_finished=until_all_finished)
+    order = [f['slot'] for f in results['finish_order']]
+    finish_ticks = [f['finish_tick'] for f in results['finish_order']]
+    return seed, results['ticks'], len(game.marbles), order, finish_ticks
+
+
+def run_batch(seeds, engine="python", max_ticks=60 * FPS, until_all_finished=False,
+              processes=None, chunksize=4):
+    tasks = [(seed, engine, max_ticks, until_all_finished) for seed in seeds]
+    with Pool(processes) as pool:
+        races = list(pool.imap_unordered(run_race, tasks, chunksize=chunksize))
+    races.sort(key=lambda race: race[0])
+    return summarize(races, engine)
+
+
+def summarize(races, engine):
+    slots = max((race[2] for race in races), default=0)
+    wins = [0] * slots
+    podiums = [0] * slots
+    margins = []
+    for seed, ticks, marbles, order, finish_ticks in races:
+        if order:
+            wins[order[0]] += 1
+        for slot in order[:3]:
+            podiums[slot] += 1
+        # Ticks between first and second place, None if nobody came second
+        margins.append(finish_ticks[1] - finish_ticks[0] if len(finish_ticks) > 1 else None)
+
+    decided = sum(wins)
+    close = sorted((m, race[0]) for m, race in zip(margins, races) if m is not None)
+    return {
+        'engine': engine,
+        'races': len(races),
+        # One column per field keeps the file compact for thousands of races
+        'seed': [race[0] for race in races],
+        'ticks': [race[1] for race in races],
+        'margin': margins,
+        'finish_order': [race[3] for race in races],
+        'slot_wins': wins,
+        'slot_win_rate': [w / decided if decided else 0 for w in wins],
+        'slot_podium_rate': [p / len(races) if races else 0 for p in podiums],
+        'closest_seeds': [seed for margin, seed in close[:20]],
+    }
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Run many headless marble races in parallel")
+    parser.add_argument("--races", type=int, default=1000, help="number of races")
+    parser.add_argument("--first-seed", type=int, default=0, help="seed of the first race")
+    parser.add_argument("--engine", choices=["python", "numpy"], default="python",
+                        help="physics engine")
+    parser.add_argument("--max-ticks", type=int, default=60 * FPS, help="tick limit per race")
+    parser.add_argument("--all", action="store_true",
+                        help="run until every marble finishes instead of the podium")
+    parser.add_argument("--processes", type=int, default=None,
+                        help="worker processes (default: one per core)")
+    parser.add_argument("--output", default="batch_results.json", help="results file")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    seeds = range(args.first_seed, args.first_seed + args.races)
+
+    started = time.perf_counter()
+    summary = run_batch(seeds, engine=args.engine, max_ticks=args.max_ticks,
+                        until_all_finished=args.all, processes=args.processes)
+    elapsed = time.perf_counter() - started
+
+    with open(args.output, "w") as f:
+        json.dump(summary, f, separators=(",", ":"))
+
+    print(f"{summary['races']} races in {elapsed:.1f}s "
+          f"({summary['races'] / elapsed:.1f} races/s) -> {args.output}")
+    print("Closest finishes (seeds):", summary['closest_seeds'][:10])
+    print("Win rate per start slot:")
+    for slot, rate in enumerate(summary['slot_win_rate']):
+        print(f"  slot {slot:2d}: {rate * 100:5.1f}%  ({summary['slot_wins'][slot]} wins)")
@@ -0,0 +1,186 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tracemalloc
+from multiprocessing import get_context
+
+try:
+    import resource
+except ImportError:  # Not on Windows, where RSS isn't reported
+    resource = None
+
+# Benchmarks never open a window
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+# Nor print pygame's banner from each memory worker
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import pygame
+
+from main import MarbleRaceGame, SCREEN_WIDTH, SCREEN_HEIGHT
+from profiler import percentile
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_baseline.json")
+REGRESSION_TOLERANCE = 0.25  # Allowed slowdown against the baseline
+SEED = 1234
+
+# (name, marbles, world height, maze density, ticks measured)
+SCENARIOS = [
+    ("marbles-12", 12, 4000, 1.0, 600),
+    ("marbles-100", 100, 4000, 1.0, 300),
+    ("marbles-1k", 1000, 4000, 1.0, 120),
+    ("marbles-10k", 10000, 4000, 1.0, 30),
+    ("world-20k", 100, 20000, 1.0, 300),
+    ("world-100k", 100, 100000, 1.0, 300),
+    ("maze-sparse", 100, 20000, 0.5, 300),
+    ("maze-dense", 100, 20000, 2.0, 300),
+]
+QUICK_SCENARIOS = ("marbles-12", "marbles-100", "world-100k", "maze-dense")
+
+
+def make_game(engine, marbles, world_height, density):
+    followers = [(f"bench_{i}", None) for i in range(marbles)]
+    return MarbleRaceGame(engine=engine, headless=True, seed=SEED, followers=followers,
+                          world_height=world_height, maze_density=density)
+
+
+def make_rendered_game(engine, marbles, world_height, density):
+    game = make_game(engine, marbles, world_height, density)
+    game.setup_rendering(pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT), 0, 32))
+    random.seed(SEED)
+    return game
+
+
+def peak_rss():
+    # Peak resident set size of this process in bytes
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return usage if sys.platform == "darwin" else usage * 1024
+
+
+def measure_rss(engine, marbles, world_height, density, ticks):
+    # Runs in a fresh process, so the peak belongs to this scenario alone;
+    # unlike tracemalloc it counts SDL surfaces and NumPy buffers
+    game = make_rendered_game(engine, marbles, world_height, density)
+    for _ in range(ticks):
+        game.update()
+        game.render()
+    return peak_rss()
+
+
+def run_scenario(engine, marbles, world_height, density, ticks):
+    # Peak memory is measured in its own passes over the same ticks, as
+    # tracemalloc skews timings
+    tracemalloc.start()
+    game = make_rendered_game(engine, marbles, world_height, density)
+    for _ in range(ticks):
+        game.update()
+        game.render()
+    peak_memory = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    # Fork server children start small; spawned ones would inherit this
+    # process's peak, which Linux keeps across exec
+    rss = None
+    if resource is not None:
+        with get_context("forkserver").Pool(1) as pool:
+            rss = pool.apply(measure_rss, (engine, marbles, world_height, density, ticks))
+
+    game = make_rendered_game(engine, marbles, world_height, density)
+
+    update_times = []
+    draw_times = []
+    for _ in range(ticks):
+        start = time.perf_counter()
+        game.update()
+        middle = time.perf_counter()
+        game.render()
+        end = time.perf_counter()
+        update_times.append(middle - start)
+        draw_times.append(end - middle)
+
+    frame_times = sorted(u + d for u, d in zip(update_times, draw_times))
+    return {
+        'ticks_per_second': len(update_times) / sum(update_times),
+        'update_ms': sum(update_times) / len(update_times) * 1000,
+        'draw_ms': sum(draw_times) / len(draw_times) * 1000,
+        'frame_p50_ms': percentile(frame_times, 50) * 1000,
+        'frame_p95_ms': percentile(frame_times, 95) * 1000,
+        'peak_memory_mb': peak_memory / 2 ** 20,
+        'peak_rss_mb': None if rss is None else rss / 2 ** 20,
+    }
+
+
+def compare(results, baseline, tolerance):
+    # Names of the benchmarks whose tick rate fell below the baseline
+    regressions = []
+    for key, result in results.items():
+        reference = baseline.get(key)
+        if reference and result['ticks_per_second'] < reference['ticks_per_second'] * (1 - tolerance):
+            regressions.append(key)
+    return regressions
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark physics and rendering at scale")
+    parser.add_argument("--engine", choices=["python", "numpy", "all"], default="all",
+                        help="physics engine(s) to benchmark")
+    parser.add_argument("--quick", action="store_true", help="only run a few small scenarios")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="baseline results file")
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="store these results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=REGRESSION_TOLERANCE,
+                        help="allowed slowdown before a scenario counts as a regression")
+    parser.add_argument("--output", help="also write the results to this JSON file")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    engines = ["python", "numpy"] if args.engine == "all" else [args.engine]
+    if "numpy" in engines:
+        try:
+            import numpy  # noqa: F401
+        except ImportError:
+            print("NumPy is not installed, skipping the numpy engine")
+            engines.remove("numpy")
+
+    results = {}
+    print("heap: peak of Python allocations (tracemalloc); rss: peak resident set of a fresh\n"
+          "process running the scenario, interpreter included, which also counts SDL surfaces\n"
+          "and NumPy arrays (ru_maxrss)")
+    print(f"{'scenario':<26}{'ticks/s':>10}{'update':>10}{'draw':>9}{'p95':>9}{'heap':>10}{'rss':>10}")
+    for name, marbles, world_height, density, ticks in SCENARIOS:
+        if args.quick and name not in QUICK_SCENARIOS:
+            continue
+        for engine in engines:
+            key = f"{engine}/{name}"
+            result = results[key] = run_scenario(engine, marbles, world_height, density, ticks)
+            rss = "n/a" if result['peak_rss_mb'] is None else f"{result['peak_rss_mb']:.1f}MB"
+            print(f"{key:<26}{result['ticks_per_second']:>10.1f}{result['update_ms']:>8.2f}ms"
+                  f"{result['draw_ms']:>7.2f}ms{result['frame_p95_ms']:>7.2f}ms"
+                  f"{result['peak_memory_mb']:>8.1f}MB{rss:>10}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+    elif not os.path.exists(args.baseline):
+        # Baselines are machine specific, so none is shipped
+        print(f"No baseline at {args.baseline}, nothing was compared; "
+              "record one on this machine with --save-baseline", file=sys.stderr)
+        sys.exit(2)
+    else:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print("Regressions against the baseline:", ", ".join(regressions))
+            sys.exit(1)
+        print("No regressions against the baseline")
@@ -0,0 +1,132 @@
+import os
+import subprocess
+import sys
+import tempfile
+
+import pygame
+
+from main import MarbleRaceGame, SCREEN_WIDTH, SCREEN_HEIGHT, FPS, MAX_SPEED
+
+TAIL_SECONDS = 3  # Keep filming the podium once the race is decided
+
+
+def raw_pixel_format(surface):
+    # ffmpeg name for the byte layout of a 32-bit surface, e.g. "bgr0"
+    channels = ['0'] * 4
+    for name, mask, shift in zip('rgba', surface.get_masks(), surface.get_shifts()):
+        if mask:
+            byte = shift // 8
+            channels[byte if sys.byteorder == 'little' else 3 - byte] = name
+    return ''.join(channels)
+
+
+class FfmpegWriter:
+    # Streams raw frames straight from the surface memory into ffmpeg's stdin.
+    # ffmpeg's messages go to a temporary file, so a failure raises a single
+    # error with its exit code and what it printed.
+
+    def __init__(self, path, surface, ffmpeg="ffmpeg", fps=FPS):
+        width, height = surface.get_size()
+        command = [
+            ffmpeg, '-y', '-loglevel', 'error',
+            '-f', 'rawvideo', '-pix_fmt', raw_pixel_format(surface),
+            '-s', f'{width}x{height}', '-r', f'{fps:g}', '-i', '-',
+            # yuv420p needs even dimensions, so 405px wide frames get 1px of padding
+            '-vf', 'pad=ceil(iw/2)*2:ceil(ih/2)*2',
+            '-c:v', 'libx264', '-preset', 'veryfast', '-pix_fmt', 'yuv420p',
+            path,
+        ]
+        self.path = path
+        self.ffmpeg = ffmpeg
+        self.failed = False
+        self.stderr = tempfile.TemporaryFile()
+        try:
+            self.process = subprocess.Popen(command, stdin=subprocess.PIPE, stderr=self.stderr)
+        except OSError as error:
+            self.stderr.close()
+            raise RuntimeError(f"Could not run ffmpeg as {ffmpeg!r} ({error.strerror}); "
+                               "install it or point --ffmpeg at it") from None
+
+    def write(self, surface):
+        # The view exposes the pixels in place; it is released right after
+        # the write so the surface is unlocked for the next frame
+        view = surface.get_view('0')
+        try:
+            self.process.stdin.write(view)
+        except BrokenPipeError:
+            # ffmpeg quit mid-stream; close() won't report it a second time
+            self.failed = True
+            raise self.error() from None
+        finally:
+            del view
+
+    def close(self):
+        try:
+            self.process.stdin.close()
+        except BrokenPipeError:
+            pass  # ffmpeg is gone already, its exit code tells whether it failed
+        if self.process.wait() != 0 and not self.failed:
+            raise self.error()
+        self.stderr.close()
+
+    def error(self):
+        code = self.process.wait()
+        self.stderr.seek(0)
+        output = self.stderr.read().decode(errors="replace").strip()
+        self.stderr.close()
+        message = f"{self.ffmpeg} exited with code {code} while encoding {self.path}"
+        return RuntimeError(f"{message}:\n{output}" if output else message)
+
+
+class PngSequenceWriter:
+    def __init__(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.frame = 0
+
+    def write(self, surface):
+        pygame.image.save(surface, os.path.join(self.directory, f"frame_{self.frame:05d}.png"))
+        self.frame += 1
+
+    def close(self):
+        pass
+
+
+def export_race(path, engine="python", seed=None, max_ticks=60 * FPS, ffmpeg="ffmpeg",
+                followers=None, record=None, replay=None, time_step=1, max_speed=MAX_SPEED):
+    # Render one frame per physics tick off-screen, with no clock in the loop;
+    # `replay` re-renders a Recording instead of simulating a new race
+    if replay is not None:
+        from replay import ReplayGame
+        game = ReplayGame(replay, headless=True)
+    else:
+        game = MarbleRaceGame(engine=engine, headless=True, seed=seed, followers=followers,
+                              time_step=time_step, max_speed=max_speed)
+        if record:
+            from replay import RaceRecorder
+            RaceRecorder(record, game)
+    surface = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT), 0, 32)
+    game.setup_rendering(surface)
+
+    # Longer time steps give fewer frames, played back at a lower frame rate
+    fps = FPS / game.time_step
+    if os.path.splitext(path)[1]:
+        writer = FfmpegWriter(path, surface, ffmpeg, fps)
+    else:
+        writer = PngSequenceWriter(path)
+
+    frames = 0
+    tail = TAIL_SECONDS * fps
+    try:
+        while game.tick < max_ticks and tail > 0:
+            game.update()
+            game.render()
+            writer.write(surface)
+            frames += 1
+            if game.race_finished:
+                tail -= 1
+    finally:
+        writer.close()
+        if game.recorder is not None:
+            game.recorder.close(game)
+    return frames
@@ -0,0 +1,179 @@
+import csv
+import json
+import random
+from array import array
+from itertools import islice
+
+# Column names tried, in order, for the follower name in an export
+NAME_FIELDS = ("username", "unique_id", "name", "nickname", "follower")
+READ_SIZE = 1 << 16
+
+
+def parse_color(value):
+    # "#ff8800", "255,136,0" or [255, 136, 0] -> (255, 136, 0); anything
+    # else -> None
+    if not value:
+        return None
+    if isinstance(value, (list, tuple)):
+        parts = list(value)
+        if not all(isinstance(part, int) for part in parts):
+            return None
+    else:
+        value = str(value).strip()
+        try:
+            if value.startswith("#") and len(value) == 7:
+                return tuple(int(value[i:i + 2], 16) for i in (1, 3, 5))
+            parts = [int(part) for part in value.split(",")]
+        except ValueError:
+            return None
+    if len(parts) == 3 and all(0 <= part <= 255 for part in parts):
+        return tuple(parts)
+    return None
+
+
+def iter_json_array(f):
+    # Items of a top-level JSON array, decoded one at a time as the file is
+    # read instead of loading the whole export
+    decoder = json.JSONDecoder()
+    buffer = f.read(READ_SIZE).lstrip()[1:]
+    while True:
+        buffer = buffer.lstrip()
+        if buffer.startswith(","):
+            buffer = buffer[1:].lstrip()
+        if buffer.startswith("]"):
+            return
+        try:
+            item, end = decoder.raw_decode(buffer)
+        except ValueError:
+            # An item cut off at the end of the buffer needs more input
+            chunk = f.read(READ_SIZE)
+            if not chunk:
+                raise
+            buffer += chunk
+            continue
+        yield item
+        buffer = buffer[end:]
+
+
+def iter_rows(path):
+    # One item per follower, streamed from a CSV, JSONL or JSON array export;
+    # JSON items are usually objects, but may be bare name strings or junk
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.endswith(".json"):
+            # .json exports are either one array or JSON Lines
+            start = f.read(READ_SIZE).lstrip()[:1]
+            f.seek(0)
+            if start == "[":
+                yield from iter_json_array(f)
+                return
+        if path.endswith((".jsonl", ".ndjson", ".json")):
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+        else:
+            yield from csv.DictReader(f)
+
+
+def row_name(row):
+    for field in NAME_FIELDS:
+        if row.get(field):
+            return str(row[field]).strip()
+    # Fall back to the first column of exports with unknown headers
+    for value in row.values():
+        if value:
+            return str(value).strip()
+    return ""
+
+
+def iter_followers(path, where=None, counts=None):
+    # (name, raw color) pairs for the rows accepted by the optional filter;
+    # colours are parsed once per distinct value by FollowerTable. A bare
+    # string is a name; other items and rows without a name are skipped and
+    # tallied in counts["skipped"] when a counts dict is given.
+    for row in iter_rows(path):
+        if isinstance(row, str):
+            row = {"name": row}
+        elif not isinstance(row, dict):
+            if counts is not None:
+                counts["skipped"] = counts.get("skipped", 0) + 1
+            continue
+        if where is not None and not where(row):
+            continue
+        name = row_name(row)
+        if name:
+            yield name, row.get("color")
+        elif counts is not None:
+            counts["skipped"] = counts.get("skipped", 0) + 1
+
+
+def reservoir_sample(items, k, rng=random):
+    # Uniform sample of k items from a stream of unknown length in O(k) memory
+    sample = list(islice(items, k))
+    for seen, item in enumerate(items, start=k + 1):
+        slot = rng.randrange(seen)
+        if slot < k:
+            sample[slot] = item
+    return sample
+
+
+class FollowerTable:
+    # Followers packed into flat arrays: UTF-8 names in one buffer with
+    # offsets, and colours as indexes into a palette of distinct colours
+
+    NO_COLOR = 0xFFFF
+
+    def __init__(self, followers=()):
+        self.name_data = bytearray()
+        self.name_offsets = array("I", [0])
+        self.color_ids = array("H")
+        self.palette = []
+        self.palette_ids = {}
+        self.skipped = 0  # Export rows that held no follower, set by load_followers
+        for name, color in followers:
+            self.append(name, color)
+
+    def append(self, name, color=None):
+        # color is an RGB tuple or a raw export value such as "#ff8800"
+        self.name_data += name.encode("utf-8")
+        self.name_offsets.append(len(self.name_data))
+        # JSON colours may be lists, which can't be dict keys
+        key = str(color) if isinstance(color, (list, dict)) else color
+        color_id = self.palette_ids.get(key)
+        if color_id is None:
+            rgb = parse_color(color)
+            color_id = self.NO_COLOR
+            if rgb is not None and len(self.palette) < self.NO_COLOR:
+                color_id = len(self.palette)
+                self.palette.append(rgb)
+            self.palette_ids[key] = color_id
+        self.color_ids.append(color_id)
+
+    def __len__(self):
+        return len(self.color_ids)
+
+    def name(self, index):
+        start, end = self.name_offsets[index], self.name_offsets[index + 1]
+        return self.name_data[start:end].decode("utf-8")
+
+    def color(self, index):
+        color_id = self.color_ids[index]
+        return None if color_id == self.NO_COLOR else self.palette[color_id]
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self.name(index), self.color(index)
+
+
+def load_followers(path, sample=None, limit=None, where=None, seed=None):
+    # Stream an export into a FollowerTable, keeping either a uniform random
+    # sample of `sample` followers or the first `limit` ones
+    counts = {}
+    followers = iter_followers(path, where, counts)
+    if sample is not None:
+        followers = reservoir_sample(followers, sample, random.Random(seed))
+    elif limit is not None:
+        followers = islice(followers, limit)
+    table = FollowerTable(followers)
+    table.skipped = counts.get("skipped", 0)
+    return table
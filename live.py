@@ -0,0 +1,172 @@
+import json
+import random
+import asyncio
+import argparse
+import threading
+from collections import deque
+from itertools import islice
+
+from followers import NAME_FIELDS, parse_color, iter_followers
+
+LIVE_HOST = "127.0.0.1"
+LIVE_PORT = 8765
+LIVE_MAX_PENDING = 100000  # Oldest events are dropped past this backlog
+LIVE_MAX_GIFT = 20  # Marbles dropped by a single gift event
+LINE_LIMIT = 1 << 16
+
+
+def parse_event(line):
+    # A plain follower name, or a JSON object such as
+    # {"type": "gift", "username": "bob", "color": "#ff8800", "count": 5};
+    # returns the (name, color) pairs to spawn
+    line = line.strip()
+    if not line:
+        return []
+    if not line.startswith("{"):
+        return [(line, None)]
+    try:
+        event = json.loads(line)
+    except ValueError:
+        return []
+    if not isinstance(event, dict):
+        return []
+    kind = event.get("type", "follow")
+    name = next((str(event[field]).strip() for field in NAME_FIELDS if event.get(field)), "")
+    if kind not in ("follow", "gift") or not name:
+        return []
+    count = 1
+    if kind == "gift":
+        try:
+            count = max(1, min(LIVE_MAX_GIFT, int(event.get("count", 1))))
+        except (TypeError, ValueError):
+            count = 1
+    return [(name, parse_color(event.get("color")))] * count
+
+
+class LiveEventServer:
+    # Local TCP server fed newline-delimited events, run by an asyncio loop
+    # on a background thread so bursts never block the game loop. Events go
+    # into a deque, whose append and popleft are atomic, and the game drains
+    # it once per frame.
+
+    def __init__(self, host=LIVE_HOST, port=LIVE_PORT, max_pending=LIVE_MAX_PENDING):
+        self.host = host
+        self.port = port
+        self.events = deque(maxlen=max_pending)
+        self.loop = None
+        self.server = None
+        self.clients = {}  # Handler task -> writer of each open connection
+        self.thread = None
+        self.error = None
+        self.ready = threading.Event()
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, name="live-events", daemon=True)
+        self.thread.start()
+        self.ready.wait()
+        if self.error is not None:
+            raise self.error
+        return self
+
+    def _run(self):
+        self.loop = asyncio.new_event_loop()
+        try:
+            self.server = self.loop.run_until_complete(
+                asyncio.start_server(self._handle, self.host, self.port, limit=LINE_LIMIT))
+        except OSError as error:
+            self.error = error
+            self.ready.set()
+            self.loop.close()
+            return
+        # Port 0 picks a free port
+        self.port = self.server.sockets[0].getsockname()[1]
+        self.ready.set()
+        try:
+            self.loop.run_forever()
+        finally:
+            self.loop.close()
+
+    async def _handle(self, reader, writer):
+        self.clients[asyncio.current_task()] = writer
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                self.events.extend(parse_event(line.decode("utf-8", "replace")))
+        except (ValueError, ConnectionError):
+            pass  # Oversized line or dropped client, forget the connection
+        except asyncio.CancelledError:
+            pass  # Closed by stop(); ending quietly keeps 3.11's stream callback from logging it
+        finally:
+            writer.close()
+            del self.clients[asyncio.current_task()]
+
+    async def _shutdown(self):
+        # Connected clients would keep wait_closed() waiting, so they are
+        # dropped and their handlers cancelled first
+        self.server.close()
+        for writer in self.clients.values():
+            writer.close()
+        tasks = list(self.clients)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await self.server.wait_closed()
+
+    def drain(self, limit):
+        # Up to `limit` pending (name, color) pairs, oldest first
+        events = self.events
+        batch = []
+        while events and len(batch) < limit:
+            batch.append(events.popleft())
+        return batch
+
+    def stop(self):
+        if self.loop is not None and self.thread.is_alive():
+            asyncio.run_coroutine_threadsafe(self._shutdown(), self.loop).result()
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join()
+
+
+async def feed(host, port, names, rate, burst):
+    # Stub event source for testing: sends follows (and every tenth a gift)
+    # at `rate` events per second, `burst` lines per write
+    reader, writer = await asyncio.open_connection(host, port)
+    lines = []
+    for i, name in enumerate(names):
+        event = {'type': "gift" if i % 10 == 9 else "follow", 'username': name}
+        if event['type'] == "gift":
+            event['count'] = random.randint(2, 5)
+        lines.append(json.dumps(event) + "\n")
+        if len(lines) >= burst:
+            writer.write("".join(lines).encode("utf-8"))
+            await writer.drain()
+            lines = []
+            if rate:
+                await asyncio.sleep(burst / rate)
+    writer.write("".join(lines).encode("utf-8"))
+    await writer.drain()
+    writer.close()
+    await writer.wait_closed()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Send test follow/gift events to a live race")
+    parser.add_argument("--host", default=LIVE_HOST)
+    parser.add_argument("--port", type=int, default=LIVE_PORT)
+    parser.add_argument("--followers", metavar="PATH",
+                        help="CSV or JSONL follower export to send names from")
+    parser.add_argument("--count", type=int, default=100, help="number of events to send")
+    parser.add_argument("--rate", type=float, default=10, help="events per second, 0 for all at once")
+    parser.add_argument("--burst", type=int, default=1, help="events sent per write")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.followers:
+        names = [name for name, _ in islice(iter_followers(args.followers), args.count)]
+    else:
+        names = [f"live_{i}" for i in range(args.count)]
+    asyncio.run(feed(args.host, args.port, names, args.rate, args.burst))
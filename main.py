@@ -2,19 +2,57 @@ import pygame
 import random
 import math
 import time
+import argparse
+import sys
+import threading
+from array import array
+from collections import OrderedDict
+from time import perf_counter_ns
 
-# Initialize Pygame
-pygame.init()
+from profiler import FrameProfiler
+from bisect import bisect_left, bisect_right
 
 # Constants - Format vertical TikTok
 SCREEN_WIDTH = 405  # 9:16 aspect ratio (405x720)
 SCREEN_HEIGHT = 720
 WORLD_HEIGHT = 4000  # Course très longue
 FPS = 60
+MAX_CATCHUP_STEPS = 5  # Physics steps allowed per rendered frame when lagging
 GRAVITY = 0.4
 FRICTION = 0.96
 BOUNCE_DAMPING = 0.7
 MAX_SPEED = 12
+# Longest move between obstacle tests: a marble centre must never cross the
+# middle of the thinnest (12px) obstacle in one move, i.e. radius + 6px
+MAX_SUBSTEP = 12
+TEXT_CACHE_SIZE = 256  # Rendered HUD strings kept before LRU eviction
+SPRITE_CACHE_SIZE = 512  # Marble sprites kept, one per colour and radius
+# Level of detail: the view is split into square cells; cells holding more
+# marbles than fit side by side are drawn as one crowd blob, and names are
+# only shown for marbles with room around them
+CROWD_CELL_SIZE = 40
+CROWD_MIN_MARBLES = 6
+LABEL_LIMIT = 40  # Most name labels drawn per frame
+MAZE_TILE_HEIGHT = 512  # Pre-rendered maze strips, blitted with the camera offset
+MAZE_CHUNK_HEIGHT = 1024  # Course generated and dropped in slices this tall
+MAZE_SECTION_REACH = 200  # Obstacles end at most this far below their section start
+MAZE_VERSION = 1  # Bump whenever a seed generates a different course
+# Marbles held in place go to sleep and skip physics until an awake marble
+# comes close. Held means still for a while, standing on an obstacle and
+# boxed in on both sides: on an open platform the anti-stuck perturbation
+# keeps a marble creeping towards an edge, however slowly, so it must not sleep.
+# A held marble still bounces about a pixel off its floor.
+SLEEP_DISTANCE = 1.5  # Most drift, in px, from where the still spell began
+SLEEP_FRAMES = 30  # Consecutive still ticks before falling asleep
+SUPPORT_GAP = 2  # Most gap, in px, between a held marble and what holds it
+WAKE_DISTANCE = 2  # An awake marble this far from contact wakes a sleeper
+# Broad-phase grid: a cell must cover two radii plus one tick of travel
+GRID_CELL_SIZE = 48
+LIVE_SPAWN_BATCH = 64  # Live-event marbles added per frame, the rest wait
+LIVE_PORT = 8765  # Same default as live.py, which is only imported for --live
+# Game attributes that outlive a race when it is restarted
+RESTART_KEEPS = ("headless", "live", "screen", "clock", "font", "big_font", "text_cache",
+                 "marble_renderer", "background")
 
 # Colors
 WHITE = (255, 255, 255)
@@ -30,6 +68,8 @@ CYAN = (0, 255, 255)
 GRAY = (128, 128, 128)
 DARK_GRAY = (64, 64, 64)
 LIGHT_BLUE = (173, 216, 230)
+MAZE_COLORKEY = (255, 0, 255)  # Transparent background of maze tiles
+MARBLE_COLORS = [RED, BLUE, GREEN, YELLOW, PURPLE, ORANGE, PINK, CYAN]
 
 # Sample TikTok followers
 SAMPLE_FOLLOWERS = [
@@ -41,10 +81,13 @@ SAMPLE_FOLLOWERS = [
 ]
 
 class Marble:
-    def __init__(self, x, y, follower_name, color):
+    def __init__(self, x, y, follower_name, color, rng=random):
+        # rng is the race's seeded stream, used for the start kick and for
+        # collision perturbations
+        self.rng = rng
         self.x = x
         self.y = y
-        self.vx = random.uniform(-0.5, 0.5)
+        self.vx = rng.uniform(-0.5, 0.5)
         self.vy = 0
         self.radius = 10
         self.follower_name = follower_name
@@ -52,58 +95,100 @@ class Marble:
         self.finished = False
         self.finish_time = None
         self.position_rank = None
+        self.label = None  # Name surface, rendered once by the game
+        self.sleeping = False
+        self.still_frames = 0
+        self.rest_x = x  # Where the current still spell began
+        self.rest_y = y
         
-    def update(self, obstacles, other_marbles):
+    def update(self, obstacles, other_marbles, tick=0, world_height=WORLD_HEIGHT,
+               dt=1, max_speed=MAX_SPEED):
+        # dt is the number of 1/FPS frames covered by this tick
         if self.finished:
             return
             
         # Apply gravity
-        self.vy += GRAVITY
+        self.vy += GRAVITY * dt
         
         # Apply friction
-        self.vx *= FRICTION
+        self.vx *= FRICTION ** dt
         
         # Limit velocities for smoother movement
-        if abs(self.vx) > MAX_SPEED:
-            self.vx = MAX_SPEED if self.vx > 0 else -MAX_SPEED
-        if abs(self.vy) > MAX_SPEED:
-            self.vy = MAX_SPEED if self.vy > 0 else -MAX_SPEED
-        
-        # Store old position
-        old_x, old_y = self.x, self.y
-        
-        # Update position
-        self.x += self.vx
-        self.y += self.vy
-        
-        # Bounce off screen edges smoothly
-        if self.x - self.radius <= 0:
-            self.x = self.radius
-            self.vx *= -BOUNCE_DAMPING
-        elif self.x + self.radius >= SCREEN_WIDTH:
-            self.x = SCREEN_WIDTH - self.radius
-            self.vx *= -BOUNCE_DAMPING
-        
-        # Check collision with obstacles first
-        collision_occurred = False
-        for obstacle in obstacles:
-            if self.check_collision(obstacle):
-                self.handle_collision(obstacle)
-                collision_occurred = True
-                break
+        if abs(self.vx) > max_speed:
+            self.vx = max_speed if self.vx > 0 else -max_speed
+        if abs(self.vy) > max_speed:
+            self.vy = max_speed if self.vy > 0 else -max_speed
         
-        # Check collision with other marbles (only if no obstacle collision)
-        if not collision_occurred:
-            for other_marble in other_marbles:
-                if other_marble != self and not other_marble.finished:
-                    if self.check_marble_collision(other_marble):
-                        self.handle_marble_collision(other_marble)
+        # Move in sub-steps of at most MAX_SUBSTEP px so fast marbles can't
+        # skip over an obstacle or another marble (one at the default speed
+        # and step), and resolve hits against the side each sub-step started from
+        travel = max(abs(self.vx), abs(self.vy)) * dt
+        steps = max(1, math.ceil(travel / MAX_SUBSTEP))
+        for _ in range(steps):
+            previous = (self.x, self.y)
+            
+            # Update position
+            self.x += self.vx * dt / steps
+            self.y += self.vy * dt / steps
+            
+            # Bounce off screen edges smoothly
+            if self.x - self.radius <= 0:
+                self.x = self.radius
+                self.vx *= -BOUNCE_DAMPING
+            elif self.x + self.radius >= SCREEN_WIDTH:
+                self.x = SCREEN_WIDTH - self.radius
+                self.vx *= -BOUNCE_DAMPING
+            
+            # Check collision with obstacles first
+            collision_occurred = False
+            for obstacle in obstacles:
+                if self.check_collision(obstacle):
+                    self.handle_collision(obstacle, previous)
+                    collision_occurred = True
+                    break
+            
+            # Check collision with other marbles (only if no obstacle collision)
+            if not collision_occurred:
+                for other_marble in other_marbles:
+                    if other_marble != self and not other_marble.finished:
+                        if self.check_marble_collision(other_marble):
+                            self.handle_marble_collision(other_marble)
         
         # Check if reached bottom (finish line)
-        if self.y > WORLD_HEIGHT - 100:
+        if self.y > world_height - 100:
             if not self.finished:
                 self.finished = True
-                self.finish_time = time.time()
+                self.finish_time = tick
+        
+        # Fall asleep once held in place for SLEEP_FRAMES ticks
+        if (abs(self.x - self.rest_x) <= SLEEP_DISTANCE
+                and abs(self.y - self.rest_y) <= SLEEP_DISTANCE):
+            self.still_frames += 1
+            if self.still_frames >= SLEEP_FRAMES and self.held(obstacles):
+                self.sleeping = True
+        else:
+            self.wake()
+    
+    def held(self, obstacles):
+        # Standing on an obstacle, with obstacles or the screen edges right
+        # next to both sides, so only another marble can move it
+        reach = self.radius + SUPPORT_GAP
+        below = False
+        left = self.x <= reach
+        right = self.x >= SCREEN_WIDTH - reach
+        for ox, oy, width, height in obstacles:
+            if ox <= self.x <= ox + width:
+                below = below or 0 <= oy - self.y <= reach
+            elif oy <= self.y <= oy + height:
+                left = left or 0 <= self.x - ox - width <= reach
+                right = right or 0 <= ox - self.x <= reach
+        return below and left and right
+    
+    def wake(self):
+        self.sleeping = False
+        self.still_frames = 0
+        self.rest_x = self.x
+        self.rest_y = self.y
     
     def check_marble_collision(self, other_marble):
         dx = self.x - other_marble.x
@@ -112,13 +197,17 @@ class Marble:
         return distance < (self.radius + other_marble.radius)
     
     def handle_marble_collision(self, other_marble):
+        # Being bumped wakes a resting marble
+        if other_marble.sleeping:
+            other_marble.wake()
+        
         dx = self.x - other_marble.x
         dy = self.y - other_marble.y
         distance = math.sqrt(dx**2 + dy**2)
         
         if distance == 0:
             # If marbles are exactly on top of each other, separate them
-            angle = random.random() * 2 * math.pi
+            angle = self.rng.random() * 2 * math.pi
             dx, dy = math.cos(angle), math.sin(angle)
             distance = 0.1
         
@@ -166,33 +255,47 @@ class Marble:
         other_marble.vy += impulse * ny
     
     def check_collision(self, obstacle):
-        closest_x = max(obstacle['x'], min(self.x, obstacle['x'] + obstacle['width']))
-        closest_y = max(obstacle['y'], min(self.y, obstacle['y'] + obstacle['height']))
+        # obstacle is an (x, y, width, height) tuple
+        ox, oy, width, height = obstacle
+        closest_x = max(ox, min(self.x, ox + width))
+        closest_y = max(oy, min(self.y, oy + height))
         
         distance = math.sqrt((self.x - closest_x)**2 + (self.y - closest_y)**2)
         return distance < self.radius
     
-    def handle_collision(self, obstacle):
+    def handle_collision(self, obstacle, previous=None):
+        # previous is the (x, y) the marble moved from, for the swept test
         # Find the closest point on the obstacle to the marble
-        closest_x = max(obstacle['x'], min(self.x, obstacle['x'] + obstacle['width']))
-        closest_y = max(obstacle['y'], min(self.y, obstacle['y'] + obstacle['height']))
+        ox, oy, width, height = obstacle
+        closest_x = max(ox, min(self.x, ox + width))
+        closest_y = max(oy, min(self.y, oy + height))
         
         # Calculate collision normal
         dx = self.x - closest_x
         dy = self.y - closest_y
         distance = math.sqrt(dx**2 + dy**2)
         
-        if distance == 0:
-            # Marble is inside obstacle, push it out
-            center_x = obstacle['x'] + obstacle['width'] / 2
-            center_y = obstacle['y'] + obstacle['height'] / 2
-            dx = self.x - center_x
-            dy = self.y - center_y
-            distance = max(1, math.sqrt(dx**2 + dy**2))
-        
-        # Normalize collision normal
-        nx = dx / distance
-        ny = dy / distance
+        # Swept test: a marble whose centre went into or right through the
+        # obstacle during its move is pushed back out on the side it came from
+        side = None
+        if previous is not None and (
+                distance == 0 or dx * (previous[0] - closest_x) + dy * (previous[1] - closest_y) < 0):
+            side = self.entry_side(obstacle, previous)
+        
+        if side is not None:
+            nx, ny, distance = side
+        else:
+            if distance == 0:
+                # Marble is inside obstacle, push it out
+                center_x = ox + width / 2
+                center_y = oy + height / 2
+                dx = self.x - center_x
+                dy = self.y - center_y
+                distance = max(1, math.sqrt(dx**2 + dy**2))
+            
+            # Normalize collision normal
+            nx = dx / distance
+            ny = dy / distance
         
         # Move marble outside obstacle smoothly
         penetration = self.radius - distance
@@ -210,235 +313,718 @@ class Marble:
             self.vy -= 2 * velocity_dot_normal * ny * BOUNCE_DAMPING
             
             # Add slight random perturbation to prevent stuck situations
-            self.vx += random.uniform(-0.3, 0.3)
-            self.vy += random.uniform(-0.1, 0.1)
+            self.vx += self.rng.uniform(-0.3, 0.3)
+            self.vy += self.rng.uniform(-0.1, 0.1)
     
-    def draw(self, screen, font, camera_y):
-        screen_y = self.y - camera_y
+    def entry_side(self, obstacle, previous):
+        # Outward normal of the side the marble entered the obstacle through,
+        # with the centre's distance past it (negative inside), or None
+        left, top, width, height = obstacle
+        right, bottom = left + width, top + height
+        ex = previous[0] - max(left, min(previous[0], right))
+        ey = previous[1] - max(top, min(previous[1], bottom))
+        entry_distance = math.sqrt(ex**2 + ey**2)
+        if entry_distance > 0:
+            # Started outside: the side facing where it came from
+            nx = ex / entry_distance
+            ny = ey / entry_distance
+            return nx, ny, (self.x - previous[0] + ex) * nx + (self.y - previous[1] + ey) * ny
         
-        # Only draw if marble is visible on screen
-        if -50 <= screen_y <= SCREEN_HEIGHT + 50:
-            pygame.draw.circle(screen, self.color, (int(self.x), int(screen_y)), self.radius)
-            pygame.draw.circle(screen, BLACK, (int(self.x), int(screen_y)), self.radius, 2)
-            
-            # Draw follower name
-            if self.radius > 8:  # Only show name if marble is big enough
-                text = font.render(self.follower_name[:6], True, BLACK)
-                text_rect = text.get_rect(center=(self.x, screen_y - self.radius - 15))
-                screen.blit(text, text_rect)
+        # Already inside, e.g. pushed in by a neighbour: trace back against
+        # the velocity to the nearest side
+        tx = ty = math.inf
+        if self.vx > 0:
+            tx = (self.x - left) / self.vx
+        elif self.vx < 0:
+            tx = (right - self.x) / -self.vx
+        if self.vy > 0:
+            ty = (self.y - top) / self.vy
+        elif self.vy < 0:
+            ty = (bottom - self.y) / -self.vy
+        if tx == ty == math.inf:
+            return None
+        if tx < ty:
+            return (-1.0, 0.0, left - self.x) if self.vx > 0 else (1.0, 0.0, self.x - right)
+        return (0.0, -1.0, top - self.y) if self.vy > 0 else (0.0, 1.0, self.y - bottom)
+
+class SpatialHash:
+    def __init__(self, cell_size=GRID_CELL_SIZE):
+        self.cell_size = cell_size
+        self.cells = {}
+        self.keys = {}
+    
+    def cell_of(self, marble):
+        return (int(marble.x // self.cell_size), int(marble.y // self.cell_size))
+    
+    def rebuild(self, marbles, slots):
+        # Bucket the racing marbles (by slot index), once per tick
+        self.cells.clear()
+        self.keys.clear()
+        for index in slots:
+            key = self.cell_of(marbles[index])
+            self.keys[index] = key
+            self.cells.setdefault(key, []).append(index)
+    
+    def move(self, index, marble):
+        # Keep the bucket of a marble in sync after it moved or got pushed
+        old_key = self.keys.get(index)
+        if old_key is None:
+            return
+        if marble.finished:
+            self.cells[old_key].remove(index)
+            del self.keys[index]
+            return
+        key = self.cell_of(marble)
+        if key != old_key:
+            self.cells[old_key].remove(index)
+            self.cells.setdefault(key, []).append(index)
+            self.keys[index] = key
+    
+    def nearby(self, marble):
+        # Indices of marbles in the 3x3 block of cells around the marble,
+        # in list order so resolution order matches a full scan
+        cx, cy = self.cell_of(marble)
+        found = []
+        for gx in (cx - 1, cx, cx + 1):
+            for gy in (cy - 1, cy, cy + 1):
+                bucket = self.cells.get((gx, gy))
+                if bucket:
+                    found.extend(bucket)
+        found.sort()
+        return found
+
+def generate_sections(rng, current_y, end_y, density, obstacles):
+    # Append the course sections starting above end_y to the flat
+    # x, y, width, height array; returns where the next section starts
+    while current_y < end_y:
+        # Random platform sections
+        if rng.random() < 0.7:
+            # Left or right platform
+            if rng.random() < 0.5:
+                # Left platform
+                width = rng.randint(100, 200)
+                obstacles.extend((20, current_y, width, 15))
+            else:
+                # Right platform
+                width = rng.randint(100, 200)
+                obstacles.extend((SCREEN_WIDTH - 20 - width, current_y, width, 15))
+        
+        # Add some center obstacles
+        if rng.random() < 0.4:
+            width = rng.randint(60, 120)
+            obstacles.extend((SCREEN_WIDTH // 2 - width // 2 + rng.randint(-30, 30),
+                              current_y + 50, width, 15))
+        
+        # Add funnel sections occasionally
+        if rng.random() < 0.3:
+            # Funnel walls
+            obstacles.extend((80, current_y + 80, 15, 60))
+            obstacles.extend((SCREEN_WIDTH - 95, current_y + 80, 15, 60))
+        
+        # Add zigzag pattern
+        if rng.random() < 0.5:
+            for i in range(3):
+                side = i % 2
+                if side == 0:
+                    obstacles.extend((30, current_y + 100 + i * 40, 150, 12))
+                else:
+                    obstacles.extend((SCREEN_WIDTH - 180, current_y + 100 + i * 40, 150, 12))
+        
+        # Density shrinks (> 1) or stretches (< 1) the gap between sections
+        current_y += int(rng.randint(150, 250) / density)
+    return current_y
+
+class ChunkedMaze:
+    # The course, generated lazily from the seeded maze stream in chunks of
+    # MAZE_CHUNK_HEIGHT as queries reach them, and dropped once everything
+    # has passed. A chunk holds the sections starting inside it; the stream
+    # state at each chunk start is kept, so a dropped chunk can be rebuilt.
+    # Live obstacles are flat arrays in maze order, sorted by top edge
+    # through `order` so a y band is found with bisect.
+    
+    def __init__(self, seed, world_height=WORLD_HEIGHT, density=1.0):
+        self.world_height = world_height
+        self.density = density
+        rng = random.Random(f"{seed}:maze")
+        self.starts = [(array("I", rng.getstate()[1]), 200)]
+        self.chunks = {}
+        self.first = self.end = 0  # Live chunks are [first, end)
+        self.version = 0  # Bumped whenever the live obstacles change
+        self.rebuild()
+    
+    def generate(self, chunk):
+        # A chunk's stream state is known once the chunk before it was made
+        while len(self.starts) <= chunk:
+            self.generate(len(self.starts) - 1)
+        state, current_y = self.starts[chunk]
+        rng = random.Random()
+        rng.setstate((3, tuple(state), None))
+        obstacles = array("i")
+        end_y = min((chunk + 1) * MAZE_CHUNK_HEIGHT, self.world_height - 200)
+        next_y = generate_sections(rng, current_y, end_y, self.density, obstacles)
+        if chunk + 1 == len(self.starts):
+            self.starts.append((array("I", rng.getstate()[1]), next_y))
+        return obstacles
+    
+    def cover(self, y_min, y_max):
+        # Make sure every obstacle touching [y_min, y_max] is live
+        first = max(0, int((y_min - MAZE_SECTION_REACH) // MAZE_CHUNK_HEIGHT))
+        end = max(first, int(y_max // MAZE_CHUNK_HEIGHT)) + 1
+        if first >= self.first and end <= self.end:
+            return
+        # Live chunks stay contiguous, so the arrays remain in maze order
+        if self.first < self.end:
+            first = min(first, self.first)
+            end = max(end, self.end)
+        for chunk in range(first, end):
+            if chunk not in self.chunks:
+                self.chunks[chunk] = self.generate(chunk)
+        self.first, self.end = first, end
+        self.rebuild()
+    
+    def drop_above(self, y):
+        # Forget the chunks whose obstacles all lie above y
+        first = min(self.end, int((y - MAZE_SECTION_REACH) // MAZE_CHUNK_HEIGHT))
+        if first <= self.first:
+            return
+        for chunk in range(self.first, first):
+            self.chunks.pop(chunk, None)
+        self.first = first
+        self.rebuild()
+    
+    def rebuild(self):
+        x, y, width, height = array("i"), array("i"), array("i"), array("i")
+        for chunk in range(self.first, self.end):
+            obstacles = self.chunks[chunk]
+            x.extend(obstacles[0::4])
+            y.extend(obstacles[1::4])
+            width.extend(obstacles[2::4])
+            height.extend(obstacles[3::4])
+        self.x, self.y, self.width, self.height = x, y, width, height
+        self.order = sorted(range(len(y)), key=y.__getitem__)
+        self.tops = array("i", [y[i] for i in self.order])
+        self.max_height = max(height, default=0)
+        self.version += 1
+    
+    def overlapping(self, y_min, y_max):
+        # (x, y, width, height) of the obstacles whose vertical extent
+        # touches [y_min, y_max], in maze order
+        self.cover(y_min, y_max)
+        x, y, width, height = self.x, self.y, self.width, self.height
+        lo = bisect_left(self.tops, y_min - self.max_height)
+        hi = bisect_right(self.tops, y_max)
+        found = [i for i in self.order[lo:hi] if y[i] + height[i] >= y_min]
+        found.sort()
+        return [(x[i], y[i], width[i], height[i]) for i in found]
 
 class Camera:
-    def __init__(self):
+    def __init__(self, world_height=WORLD_HEIGHT):
+        self.world_height = world_height
         self.y = 0
         self.target_y = 0
         self.smooth_factor = 0.08  # Slower, smoother camera movement
         self.velocity = 0
     
-    def update(self, marbles):
-        # Find the marble that's furthest down (leading the race)
-        active_marbles = [m for m in marbles if not m.finished]
-        if active_marbles:
-            leading_marble = max(active_marbles, key=lambda m: m.y)
+    def update(self, leading_marble, dt=1):
+        # Follow the marble that's furthest down (leading the race)
+        if leading_marble is not None:
             # Center camera on leading marble with some offset
             self.target_y = leading_marble.y - SCREEN_HEIGHT // 3  # Show more of what's coming
         else:
             # If all marbles finished, focus on finish line
-            finished_marbles = [m for m in marbles if m.finished]
-            if finished_marbles:
-                self.target_y = WORLD_HEIGHT - SCREEN_HEIGHT + 50
+            self.target_y = self.world_height - SCREEN_HEIGHT + 50
         
         # Smooth camera movement with acceleration
         diff = self.target_y - self.y
-        self.velocity += diff * 0.002  # Smooth acceleration
-        self.velocity *= 0.95  # Damping
-        self.y += self.velocity
+        self.velocity += diff * 0.002 * dt  # Smooth acceleration
+        self.velocity *= 0.95 ** dt  # Damping
+        self.y += self.velocity * dt
         
         # Keep camera within bounds
-        self.y = max(0, min(WORLD_HEIGHT - SCREEN_HEIGHT, self.y))
+        self.y = max(0, min(self.world_height - SCREEN_HEIGHT, self.y))
+
+class TextCache:
+    def __init__(self, max_size=TEXT_CACHE_SIZE):
+        # Rendered text surfaces keyed by (string, font, color), LRU evicted
+        self.max_size = max_size
+        self.surfaces = OrderedDict()
+    
+    def render(self, text, font, color):
+        key = (text, font, color)
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.surfaces.move_to_end(key)
+            return surface
+        surface = font.render(text, True, color)
+        self.surfaces[key] = surface
+        if len(self.surfaces) > self.max_size:
+            self.surfaces.popitem(last=False)
+        return surface
+
+class MarbleRenderer:
+    # Draws the field with level of detail: pre-rendered sprites per colour
+    # blitted in one Surface.blits call, names only where the field is sparse,
+    # and one blob per cell piled too deep to tell the marbles apart. Blits
+    # are bounded by the number of cells, whatever the marble count. Crowds
+    # are grouped in world pixels and drawn shrunk by scale, if any.
+    
+    def __init__(self, font, text_cache, scale=1):
+        self.font = font
+        self.text_cache = text_cache
+        self.scale = scale
+        self.sprites = OrderedDict()
+    
+    def sprite(self, color, radius):
+        key = (color, radius)
+        sprite = self.sprites.get(key)
+        if sprite is not None:
+            self.sprites.move_to_end(key)
+            return sprite
+        # Same pixels as the two draw.circle calls, on a transparent key
+        colorkey = MAZE_COLORKEY if tuple(color) != MAZE_COLORKEY else WHITE
+        sprite = pygame.Surface((2 * radius, 2 * radius))
+        sprite.fill(colorkey)
+        pygame.draw.circle(sprite, color, (radius, radius), radius)
+        pygame.draw.circle(sprite, BLACK, (radius, radius), radius, 2)
+        if pygame.display.get_surface() is not None:
+            sprite = sprite.convert()
+        sprite.set_colorkey(colorkey, pygame.RLEACCEL)
+        self.sprites[key] = sprite
+        if len(self.sprites) > SPRITE_CACHE_SIZE:
+            self.sprites.popitem(last=False)
+        return sprite
+    
+    def label(self, marble):
+        # Name surfaces are rendered once, the first time they are shown
+        if marble.label is None:
+            marble.label = self.font.render(marble.follower_name[:6], True, BLACK)
+        return marble.label
+    
+    def draw(self, screen, marbles, visible, camera_y):
+        # visible holds (slot, x, y, radius) for the marbles in view
+        cells = {}
+        for entry in visible:
+            key = (int(entry[1] // CROWD_CELL_SIZE), int((entry[2] - camera_y) // CROWD_CELL_SIZE))
+            members = cells.get(key)
+            if members is None:
+                cells[key] = [entry]
+            else:
+                members.append(entry)
+        
+        label_all = len(visible) <= LABEL_LIMIT
+        scale = self.scale
+        sprites = []
+        labels = []
+        crowds = []
+        for (column, row), members in cells.items():
+            if len(members) >= CROWD_MIN_MARBLES:
+                crowds.append(members)
+                continue
+            # A name fits if the marble is alone in its block of nine cells
+            show_labels = label_all or (len(members) == 1 and sum(
+                len(cells.get((column + dx, row + dy), ()))
+                for dx in (-1, 0, 1) for dy in (-1, 0, 1)) == 1)
+            for slot, x, y, radius in members:
+                marble = marbles[slot]
+                screen_x, screen_y = int(x * scale), int((y - camera_y) * scale)
+                size = max(1, round(radius * scale))
+                sprites.append((self.sprite(marble.color, size),
+                                (screen_x - size, screen_y - size)))
+                # Only show the name if the marble is big enough to carry one
+                if radius > 8 and show_labels and len(labels) < LABEL_LIMIT:
+                    text = self.label(marble)
+                    labels.append((text, text.get_rect(
+                        center=(x * scale, screen_y - size - round(15 * scale)))))
+        screen.blits(sprites, doreturn=False)
+        
+        for members in crowds:
+            self.draw_crowd(screen, marbles, members, camera_y)
+        screen.blits(labels, doreturn=False)
+    
+    def draw_crowd(self, screen, marbles, members, camera_y):
+        # One blob in the members' average colour with their count
+        count = len(members)
+        x = sum(entry[1] for entry in members) / count
+        y = sum(entry[2] for entry in members) / count - camera_y
+        color = [0, 0, 0]
+        for entry in members:
+            for channel, value in enumerate(marbles[entry[0]].color):
+                color[channel] += value
+        color = tuple(channel // count for channel in color)
+        radius = max(2, round((CROWD_CELL_SIZE // 2 + min(count, 30) // 3) * self.scale))
+        center = (int(x * self.scale), int(y * self.scale))
+        pygame.draw.circle(screen, color, center, radius)
+        pygame.draw.circle(screen, BLACK, center, radius, 2)
+        text = self.text_cache.render(str(count), self.font, WHITE)
+        screen.blit(text, text.get_rect(center=center))
+
+# Fonts and static surfaces shared by every race in the process, so restarts
+# and new games reuse them; emptied when pygame shuts down
+ASSETS = {}
+
+def open_window(size, caption):
+    # Only the video subsystem is started, pygame.init() would also bring up
+    # audio, joysticks and the rest
+    pygame.display.init()
+    screen = pygame.display.set_mode(size)
+    pygame.display.set_caption(caption)
+    return screen
+
+def close_window():
+    ASSETS.clear()
+    pygame.quit()
+
+def load_font(size):
+    key = ("font", size)
+    font = ASSETS.get(key)
+    if font is None:
+        pygame.font.init()
+        font = ASSETS[key] = pygame.font.Font(None, size)
+    return font
+
+def load_background():
+    background = ASSETS.get("background")
+    if background is None:
+        background = ASSETS["background"] = build_background()
+    return background
+
+def build_background():
+    # Sky gradient, rendered once instead of 720 lines per frame
+    background = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
+    for y in range(SCREEN_HEIGHT):
+        color_ratio = y / SCREEN_HEIGHT
+        r = int(135 + (200 - 135) * color_ratio)
+        g = int(206 + (220 - 206) * color_ratio)
+        b = int(235 + (255 - 235) * color_ratio)
+        pygame.draw.line(background, (r, g, b), (0, y), (SCREEN_WIDTH, y))
+    return background
+
+class MazeLayer:
+    def __init__(self, maze, font, world_height=WORLD_HEIGHT, scale=1):
+        # Static maze and finish line, pre-rendered in world-space strips
+        # drawn shrunk by scale, if any
+        self.maze = maze
+        self.font = font
+        self.world_height = world_height
+        self.scale = scale
+        self.tiles = {}
+    
+    def render_tile(self, row):
+        top = row * MAZE_TILE_HEIGHT
+        scale = self.scale
+        tile = pygame.Surface((math.ceil(SCREEN_WIDTH * scale), math.ceil(MAZE_TILE_HEIGHT * scale)))
+        tile.fill(MAZE_COLORKEY)
+        tile.set_colorkey(MAZE_COLORKEY)
+        border = max(1, round(2 * scale))
+        
+        for x, y, width, height in self.maze.overlapping(top, top + MAZE_TILE_HEIGHT):
+            rect = (round(x * scale), round((y - top) * scale),
+                    round(width * scale), round(height * scale))
+            pygame.draw.rect(tile, DARK_GRAY, rect)
+            pygame.draw.rect(tile, BLACK, rect, border)
+        
+        finish_y = self.world_height - 100 - top
+        if finish_y < MAZE_TILE_HEIGHT and finish_y + 100 > 0:
+            finish = (0, round(finish_y * scale), tile.get_width(), round(100 * scale))
+            pygame.draw.rect(tile, GREEN, finish)
+            finish_text = self.font.render("FINISH", True, BLACK)
+            tile.blit(finish_text, finish_text.get_rect(center=pygame.Rect(finish).center))
+        
+        # Match the window's pixel format for fast blits when there is one
+        if pygame.display.get_surface() is not None:
+            tile = tile.convert()
+        return tile
+    
+    def prepare(self, camera_y):
+        # Render the strips in view; returns their rows
+        first_row = int(camera_y // MAZE_TILE_HEIGHT)
+        last_row = int((camera_y + SCREEN_HEIGHT) // MAZE_TILE_HEIGHT)
+        
+        # Drop strips the camera has scrolled past
+        for row in [row for row in self.tiles if row < first_row - 1]:
+            del self.tiles[row]
+        
+        for row in range(first_row, last_row + 1):
+            if row not in self.tiles:
+                self.tiles[row] = self.render_tile(row)
+        return range(first_row, last_row + 1)
+    
+    def draw(self, screen, camera_y):
+        for row in self.prepare(camera_y):
+            screen.blit(self.tiles[row], (0, int((row * MAZE_TILE_HEIGHT - camera_y) * self.scale)))
 
 class MarbleRaceGame:
-    def __init__(self):
-        self.screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-        pygame.display.set_caption("TikTok Followers Marble Race - Vertical Format")
-        self.clock = pygame.time.Clock()
-        self.font = pygame.font.Font(None, 20)
-        self.big_font = pygame.font.Font(None, 32)
+    def __init__(self, engine="python", headless=False, seed=None, followers=None,
+                 profile=False, world_height=WORLD_HEIGHT, maze_density=1.0,
+                 time_step=1, max_speed=MAX_SPEED):
+        self.engine = engine
+        self.headless = headless
+        self.followers = followers
+        self.world_height = world_height
+        self.maze_density = maze_density
+        # Frames of 1/FPS advanced per tick; larger steps and speed caps stay
+        # stable thanks to sub-stepping and finish a race in fewer ticks
+        self.time_step = time_step
+        self.max_speed = max_speed
+        # Headless profiling keeps every frame so it can be exported
+        self.profiler = FrameProfiler(enabled=profile, record=profile and headless)
+        
+        # Independent seeded streams for the marbles and the maze, so a race
+        # is reproducible from its seed and the followers don't change the maze
+        self.seed = seed if seed is not None else random.randrange(2 ** 32)
+        self.marble_rng = random.Random(f"{self.seed}:marbles")
+        self.recorder = None
+        self.live = None  # LiveEventServer feeding followers in mid-race
+        self.last_spawned = None
         
         # Camera for following marbles
-        self.camera = Camera()
+        self.camera = Camera(world_height)
+        
+        # Broad phase for marble-vs-marble collisions, cells grow with the
+        # distance a marble can cover in one tick
+        travel = max_speed * time_step
+        self.grid = SpatialHash(max(GRID_CELL_SIZE, math.ceil(20 + 2 * travel)))
         
         # Create marbles
         self.marbles = []
-        self.create_marbles()
+        self.create_marbles(followers)
+        
+        # Long vertical maze, generated as the race gets to it
+        self.maze = ChunkedMaze(self.seed, world_height, maze_density)
         
-        # Create long vertical maze
-        self.obstacles = self.create_long_maze()
+        # The NumPy engine owns marble state, self.marbles become views on it
+        self.physics = None
+        if engine == "numpy":
+            from vector_physics import VectorPhysics
+            self.physics = VectorPhysics(self.marbles, self.maze, self.seed, world_height,
+                                         time_step, max_speed)
+            self.marbles = self.physics.views
+        elif engine != "python":
+            raise ValueError(f"Unknown physics engine: {engine}")
         
-        # Game state
-        self.start_time = time.time()
+        # Game state, timed in fixed physics ticks rather than wall-clock
+        self.tick = 0
         self.race_finished = False
         self.winners = []
         
-    def create_marbles(self):
-        colors = [RED, BLUE, GREEN, YELLOW, PURPLE, ORANGE, PINK, CYAN]
+        # Race state kept up to date as marbles move, instead of re-scanning
+        # the field: slots in finishing order and the leading racing marble
+        self.finish_order = []
+        self.leader = None
+        self.trailing_y = None  # Highest racing marble, to drop passed maze chunks
+        # Slots still racing; finished marbles drop out of all physics work
+        self.racing = list(range(len(self.marbles)))
         
-        followers = SAMPLE_FOLLOWERS[:12]  # 12 marbles for better performance
+        # Headless races never open a window or load fonts
+        self.screen = None
+        self.next_race = None  # Built in the background for an instant restart
+        self.preparing = None
+        if not headless:
+            self.setup_rendering(open_window((SCREEN_WIDTH, SCREEN_HEIGHT),
+                                             "TikTok Followers Marble Race - Vertical Format"))
+            self.clock = pygame.time.Clock()
+            self.prepare_next_race()
         
-        for i, follower in enumerate(followers):
-            x = 50 + (i % 6) * 50  # 6 marbles per row
-            y = 50 + (i // 6) * 30
-            color = colors[i % len(colors)]
-            marble = Marble(x, y, follower, color)
+    def setup_rendering(self, surface):
+        # Render into the window, or an off-screen Surface for video export
+        self.screen = surface
+        self.font = load_font(20)
+        self.big_font = load_font(32)
+        self.text_cache = TextCache()
+        self.marble_renderer = MarbleRenderer(self.font, self.text_cache)
+        
+        # Static layers are drawn once and blitted every frame
+        self.background = load_background()
+        self.maze_layer = MazeLayer(self.maze, self.font, self.world_height)
+    
+    def create_marbles(self, followers=None):
+        # (name, color) pairs, e.g. a FollowerTable from followers.py
+        if followers is None:
+            followers = [(name, None) for name in SAMPLE_FOLLOWERS[:12]]
+        
+        if len(followers) <= 12:
+            start_x, per_row, spacing_x, spacing_y = 50, 6, 50, 30  # 6 marbles per row
+        else:
+            # Big fields pack tighter rows, stacked upwards above the start
+            start_x, per_row, spacing_x, spacing_y = 20, 15, 25, -25
+        
+        for i, (follower, color) in enumerate(followers):
+            x = start_x + (i % per_row) * spacing_x
+            y = 50 + (i // per_row) * spacing_y
+            color = color or MARBLE_COLORS[i % len(MARBLE_COLORS)]
+            marble = Marble(x, y, follower, color, self.marble_rng)
             self.marbles.append(marble)
     
-    def create_long_maze(self):
-        obstacles = []
-        
-        # Create a long vertical maze with multiple sections
-        current_y = 200
-        
-        while current_y < WORLD_HEIGHT - 200:
-            # Random platform sections
-            if random.random() < 0.7:
-                # Left or right platform
-                if random.random() < 0.5:
-                    # Left platform
-                    width = random.randint(100, 200)
-                    obstacles.append({
-                        'x': 20,
-                        'y': current_y,
-                        'width': width,
-                        'height': 15
-                    })
-                else:
-                    # Right platform
-                    width = random.randint(100, 200)
-                    obstacles.append({
-                        'x': SCREEN_WIDTH - 20 - width,
-                        'y': current_y,
-                        'width': width,
-                        'height': 15
-                    })
-            
-            # Add some center obstacles
-            if random.random() < 0.4:
-                width = random.randint(60, 120)
-                obstacles.append({
-                    'x': SCREEN_WIDTH // 2 - width // 2 + random.randint(-30, 30),
-                    'y': current_y + 50,
-                    'width': width,
-                    'height': 15
-                })
-            
-            # Add funnel sections occasionally
-            if random.random() < 0.3:
-                # Funnel walls
-                obstacles.append({
-                    'x': 80,
-                    'y': current_y + 80,
-                    'width': 15,
-                    'height': 60
-                })
-                obstacles.append({
-                    'x': SCREEN_WIDTH - 95,
-                    'y': current_y + 80,
-                    'width': 15,
-                    'height': 60
-                })
+    def spawn_marbles(self, followers):
+        # Drop a batch of (name, color) followers in mid-race, in rows above
+        # the top of the view, stacked over the previous batch while it is
+        # still up there; the physics state grows once per batch
+        first = len(self.marbles)
+        top = self.camera.y - 20
+        if self.last_spawned is not None:
+            top = min(top, self.last_spawned.y - 25)
+        spawned = []
+        for i, (follower, color) in enumerate(followers):
+            x = 20 + (i % 15) * 25 + self.marble_rng.uniform(-3, 3)
+            y = top - (i // 15) * 25
+            color = color or MARBLE_COLORS[(first + i) % len(MARBLE_COLORS)]
+            spawned.append(Marble(x, y, follower, color, self.marble_rng))
+        if not spawned:
+            return
+        
+        if self.physics is not None:
+            self.physics.add_marbles(spawned)
+        else:
+            self.marbles.extend(spawned)
+        self.racing.extend(range(first, len(self.marbles)))
+        self.last_spawned = self.marbles[-1]
+    
+    def update_marbles(self):
+        # Update marbles, only testing neighbours from the spatial hash.
+        # Returns the slots that finished this tick.
+        marbles = self.marbles
+        profiler = self.profiler if self.profiler.enabled else None
+        finished_now = []
+        leader = None
+        trailing_y = None
+        self.grid.rebuild(marbles, self.racing)
+        for index in self.racing:
+            marble = marbles[index]
+            if trailing_y is None or marble.y < trailing_y:
+                trailing_y = marble.y
+            # Sleeping marbles stay put, but still collide with others,
+            # until an awake one comes close
+            if marble.sleeping:
+                if not self.disturbed(index):
+                    if leader is None or marble.y > leader.y:
+                        leader = marble
+                    continue
+                marble.wake()
             
-            # Add zigzag pattern
-            if random.random() < 0.5:
-                for i in range(3):
-                    side = i % 2
-                    if side == 0:
-                        obstacles.append({
-                            'x': 30,
-                            'y': current_y + 100 + i * 40,
-                            'width': 150,
-                            'height': 12
-                        })
-                    else:
-                        obstacles.append({
-                            'x': SCREEN_WIDTH - 180,
-                            'y': current_y + 100 + i * 40,
-                            'width': 150,
-                            'height': 12
-                        })
+            # A marble moves at most max_speed per frame before testing obstacles
+            reach = marble.radius + self.max_speed * self.time_step
+            nearby_obstacles = self.maze.overlapping(marble.y - reach, marble.y + reach)
+            nearby = self.grid.nearby(marble)
+            if profiler:
+                profiler.count_tests(len(nearby_obstacles) + len(nearby) - 1)
+            marble.update(nearby_obstacles, [marbles[i] for i in nearby], self.tick,
+                          self.world_height, self.time_step, self.max_speed)
+            # Collisions may have pushed neighbours across cells too
+            for i in nearby:
+                self.grid.move(i, marbles[i])
             
-            current_y += random.randint(150, 250)
-        
-        return obstacles
+            # Track the leader on the way instead of a separate pass
+            if marble.finished:
+                finished_now.append(index)
+            elif leader is None or marble.y > leader.y:
+                leader = marble
+        self.leader = leader
+        self.trailing_y = trailing_y
+        if finished_now:
+            self.racing = [i for i in self.racing if not marbles[i].finished]
+        return finished_now
+    
+    def disturbed(self, index):
+        # Whether an awake racing marble is within WAKE_DISTANCE of touching
+        marbles = self.marbles
+        marble = marbles[index]
+        for i in self.grid.nearby(marble):
+            other = marbles[i]
+            if i != index and not other.sleeping:
+                reach = marble.radius + other.radius + WAKE_DISTANCE
+                if (other.x - marble.x) ** 2 + (other.y - marble.y) ** 2 < reach * reach:
+                    return True
+        return False
     
     def update(self):
-        # Update marbles
-        for marble in self.marbles:
-            marble.update(self.obstacles, self.marbles)
+        profiler = self.profiler if self.profiler.enabled else None
+        if profiler:
+            start = perf_counter_ns()
+        
+        self.tick += 1
+        if self.physics is not None:
+            finished_now = self.physics.step(self.tick)
+            leader = self.physics.leader
+            self.leader = None if leader is None else self.marbles[leader]
+            self.trailing_y = self.physics.trailing_y
+            if profiler:
+                profiler.count_tests(self.physics.collision_tests)
+        else:
+            finished_now = self.update_marbles()
+        if profiler:
+            start = profiler.add("marbles", start)
         
         # Update camera
-        self.camera.update(self.marbles)
+        self.camera.update(self.leader, self.time_step)
+        
+        # Forget the maze chunks every racing marble and the view have left
+        top = self.camera.y
+        if self.trailing_y is not None:
+            top = min(top, self.trailing_y)
+        self.maze.drop_above(top - SCREEN_HEIGHT)
+        if profiler:
+            start = profiler.add("camera", start)
+        
+        # Rank new finishers; same-tick finishers arrive in start slot order
+        for slot in finished_now:
+            self.finish_order.append(slot)
+            if not self.race_finished:
+                self.marbles[slot].position_rank = len(self.finish_order)
         
         # Check race completion
-        finished_marbles = [m for m in self.marbles if m.finished]
-        if finished_marbles and not self.race_finished:
-            finished_marbles.sort(key=lambda m: m.finish_time)
-            for i, marble in enumerate(finished_marbles):
-                if marble.position_rank is None:
-                    marble.position_rank = i + 1
-            
-            if len(finished_marbles) >= 3 or len(finished_marbles) == len(self.marbles):
+        if finished_now and not self.race_finished:
+            if len(self.finish_order) >= 3 or len(self.finish_order) == len(self.marbles):
                 self.race_finished = True
-                self.winners = finished_marbles[:3]
+                self.winners = [self.marbles[slot] for slot in self.finish_order[:3]]
+        if profiler:
+            profiler.add("ranking", start)
+        
+        if self.recorder is not None:
+            self.recorder.capture(self)
     
     def draw(self):
-        # Background gradient
-        for y in range(SCREEN_HEIGHT):
-            color_ratio = y / SCREEN_HEIGHT
-            r = int(135 + (200 - 135) * color_ratio)
-            g = int(206 + (220 - 206) * color_ratio)
-            b = int(235 + (255 - 235) * color_ratio)
-            pygame.draw.line(self.screen, (r, g, b), (0, y), (SCREEN_WIDTH, y))
-        
-        # Draw obstacles (maze) - only visible ones
-        for obstacle in self.obstacles:
-            screen_y = obstacle['y'] - self.camera.y
-            if -50 <= screen_y <= SCREEN_HEIGHT + 50:
-                pygame.draw.rect(self.screen, DARK_GRAY, 
-                               (obstacle['x'], screen_y, obstacle['width'], obstacle['height']))
-                pygame.draw.rect(self.screen, BLACK, 
-                               (obstacle['x'], screen_y, obstacle['width'], obstacle['height']), 2)
-        
-        # Draw finish line
-        finish_screen_y = WORLD_HEIGHT - 100 - self.camera.y
-        if -50 <= finish_screen_y <= SCREEN_HEIGHT + 50:
-            pygame.draw.rect(self.screen, GREEN, (0, finish_screen_y, SCREEN_WIDTH, 100))
-            finish_text = self.font.render("FINISH", True, BLACK)
-            finish_rect = finish_text.get_rect(center=(SCREEN_WIDTH // 2, finish_screen_y + 50))
-            self.screen.blit(finish_text, finish_rect)
+        profiler = self.profiler if self.profiler.enabled else None
+        if profiler:
+            start = perf_counter_ns()
+        self.render()
+        pygame.display.flip()
+        if profiler:
+            profiler.add("draw", start)
+            profiler.end_frame()
+    
+    def render(self):
+        # Background gradient and maze from the pre-rendered layers
+        self.screen.blit(self.background, (0, 0))
+        self.maze_layer.draw(self.screen, self.camera.y)
         
-        # Draw marbles
-        for marble in self.marbles:
-            marble.draw(self.screen, self.font, self.camera.y)
+        # Draw marbles, culled to the view
+        top = self.camera.y - 50
+        bottom = self.camera.y + SCREEN_HEIGHT + 50
+        if self.physics is not None:
+            visible = self.physics.visible(top, bottom)
+        else:
+            visible = [(slot, marble.x, marble.y, marble.radius)
+                       for slot, marble in enumerate(self.marbles) if top <= marble.y <= bottom]
+        self.marble_renderer.draw(self.screen, self.marbles, visible, self.camera.y)
         
         # Draw race info overlay
-        elapsed_time = time.time() - self.start_time
-        time_text = self.font.render(f"Time: {elapsed_time:.1f}s", True, WHITE)
+        elapsed_time = self.tick * self.time_step / FPS
+        time_text = self.text_cache.render(f"Time: {elapsed_time:.1f}s", self.font, WHITE)
         time_bg = pygame.Rect(5, 5, time_text.get_width() + 10, time_text.get_height() + 5)
         pygame.draw.rect(self.screen, (0, 0, 0, 128), time_bg)
         self.screen.blit(time_text, (10, 8))
         
         # Draw mini leaderboard
-        finished_marbles = [m for m in self.marbles if m.finished and m.position_rank]
-        if finished_marbles:
-            finished_marbles.sort(key=lambda m: m.position_rank)
-            for i, marble in enumerate(finished_marbles[:3]):
-                rank_text = self.font.render(f"{marble.position_rank}. {marble.follower_name[:8]}", True, WHITE)
-                rank_bg = pygame.Rect(5, 35 + i * 25, rank_text.get_width() + 10, rank_text.get_height() + 5)
-                pygame.draw.rect(self.screen, (0, 0, 0, 128), rank_bg)
-                self.screen.blit(rank_text, (10, 38 + i * 25))
+        for i, slot in enumerate(self.finish_order[:3]):
+            marble = self.marbles[slot]
+            rank_text = self.text_cache.render(f"{marble.position_rank}. {marble.follower_name[:8]}", self.font, WHITE)
+            rank_bg = pygame.Rect(5, 35 + i * 25, rank_text.get_width() + 10, rank_text.get_height() + 5)
+            pygame.draw.rect(self.screen, (0, 0, 0, 128), rank_bg)
+            self.screen.blit(rank_text, (10, 38 + i * 25))
         
         # Draw winner announcement
         if self.race_finished and self.winners:
-            winner_text = self.big_font.render(f"WINNER: {self.winners[0].follower_name}!", True, YELLOW)
+            winner_text = self.text_cache.render(f"WINNER: {self.winners[0].follower_name}!", self.big_font, YELLOW)
             winner_bg = pygame.Rect(SCREEN_WIDTH // 2 - winner_text.get_width() // 2 - 10, 
                                   SCREEN_HEIGHT // 2 - 20, 
                                   winner_text.get_width() + 20, 
@@ -449,10 +1035,8 @@ class MarbleRaceGame:
         
         # Draw progress indicator
         if not self.race_finished:
-            active_marbles = [m for m in self.marbles if not m.finished]
-            if active_marbles:
-                leading_marble = max(active_marbles, key=lambda m: m.y)
-                progress = min(leading_marble.y / WORLD_HEIGHT, 1.0)
+            if self.leader is not None:
+                progress = min(self.leader.y / self.world_height, 1.0)
                 
                 # Progress bar
                 bar_width = SCREEN_WIDTH - 20
@@ -463,14 +1047,14 @@ class MarbleRaceGame:
                 pygame.draw.rect(self.screen, (100, 100, 100), (bar_x, bar_y, bar_width, bar_height))
                 pygame.draw.rect(self.screen, GREEN, (bar_x, bar_y, bar_width * progress, bar_height))
                 
-                progress_text = self.font.render(f"Progress: {progress*100:.1f}%", True, WHITE)
+                progress_text = self.text_cache.render(f"Progress: {progress*100:.1f}%", self.font, WHITE)
                 progress_bg = pygame.Rect(bar_x, bar_y - 20, progress_text.get_width() + 10, progress_text.get_height() + 5)
                 pygame.draw.rect(self.screen, (0, 0, 0, 128), progress_bg)
                 self.screen.blit(progress_text, (bar_x + 5, bar_y - 17))
         
         # Instructions
         if elapsed_time < 5:  # Show for first 5 seconds
-            instruction_text = self.font.render("TikTok Marble Race!", True, WHITE)
+            instruction_text = self.text_cache.render("TikTok Marble Race!", self.font, WHITE)
             inst_bg = pygame.Rect(SCREEN_WIDTH // 2 - instruction_text.get_width() // 2 - 10, 
                                 SCREEN_HEIGHT - 80, 
                                 instruction_text.get_width() + 20, 
@@ -478,12 +1062,89 @@ class MarbleRaceGame:
             pygame.draw.rect(self.screen, (0, 0, 0, 150), inst_bg)
             self.screen.blit(instruction_text, (SCREEN_WIDTH // 2 - instruction_text.get_width() // 2, SCREEN_HEIGHT - 75))
         
-        pygame.display.flip()
+        # Profiler overlay (F3)
+        if self.profiler.enabled:
+            for i, line in enumerate(self.profiler.overlay_lines()):
+                text = self.text_cache.render(line, self.font, YELLOW)
+                text_bg = pygame.Rect(SCREEN_WIDTH - text.get_width() - 15, 5 + i * 18,
+                                      text.get_width() + 10, text.get_height() + 4)
+                pygame.draw.rect(self.screen, BLACK, text_bg)
+                self.screen.blit(text, (text_bg.x + 5, text_bg.y + 2))
+    
+    def new_race(self):
+        # The same settings with a new seed, without a window
+        return MarbleRaceGame(self.engine, headless=True, followers=self.followers,
+                              world_height=self.world_height, maze_density=self.maze_density,
+                              time_step=self.time_step, max_speed=self.max_speed)
+    
+    def prepare_next_race(self):
+        # Build the next race and render the maze strips it starts on while
+        # this one runs, so a restart only swaps state in
+        def prepare():
+            game = self.new_race()
+            game.maze_layer = MazeLayer(game.maze, self.font, game.world_height)
+            game.maze_layer.prepare(game.camera.y)
+            self.next_race = game
+        
+        self.next_race = None
+        self.preparing = threading.Thread(target=prepare, name="next-race", daemon=True)
+        self.preparing.start()
     
     def restart_race(self):
-        self.__init__()
+        # A recording covers a single race; live events, the window, fonts
+        # and render caches carry on
+        if self.recorder is not None:
+            self.recorder.close(self)
+        # Normally ready long before R is pressed; built here if it never was
+        if self.preparing is not None:
+            self.preparing.join()
+        game = self.next_race
+        if game is None:
+            game = self.new_race()
+            if self.screen is not None:
+                game.maze_layer = MazeLayer(game.maze, self.font, game.world_height)
+        game.profiler = FrameProfiler(enabled=self.profiler.enabled, record=self.profiler.record)
+        for name in RESTART_KEEPS:
+            if name in vars(self):
+                setattr(game, name, getattr(self, name))
+        vars(self).update(vars(game))
+        if self.screen is not None:
+            self.prepare_next_race()
+    
+    def results(self):
+        # Finish order with tick-based times, ties broken by start slot
+        return {
+            'ticks': self.tick,
+            'seconds': self.tick * self.time_step / FPS,
+            'finish_order': [
+                {'name': self.marbles[slot].follower_name, 'slot': slot,
+                 'finish_tick': self.marbles[slot].finish_time}
+                for slot in self.finish_order
+            ],
+        }
+    
+    def run_headless(self, max_ticks=60 * FPS, until_all_finished=False):
+        # Simulate as fast as the CPU allows, with no window and no clock
+        while self.tick < max_ticks:
+            self.update()
+            if self.profiler.enabled:
+                self.profiler.end_frame()
+            if until_all_finished:
+                if len(self.finish_order) == len(self.marbles):
+                    break
+            elif self.race_finished:
+                break
+        return self.results()
     
     def run(self):
+        # One physics tick per rendered frame, at FPS / time_step frames per
+        # second so a race keeps its pace. tick() already holds that rate, so
+        # the whole milliseconds it returns never add or drop a tick; only a
+        # stall of a full tick or more is caught up with extra ticks.
+        rate = FPS / self.time_step
+        step_ms = 1000 / rate
+        lag = 0
+        self.clock.tick()
         running = True
         while running:
             for event in pygame.event.get():
@@ -492,16 +1153,125 @@ class MarbleRaceGame:
                 elif event.type == pygame.KEYDOWN:
                     if event.key == pygame.K_r:
                         self.restart_race()
+                    elif event.key == pygame.K_F3:
+                        self.profiler.enabled = not self.profiler.enabled
                     elif event.key == pygame.K_ESCAPE:
                         running = False
             
+            # New followers from the live feed, a bounded batch per frame
+            if self.live is not None:
+                self.spawn_marbles(self.live.drain(LIVE_SPAWN_BATCH))
+            
             self.update()
+            steps = 1
+            while lag >= step_ms and steps < MAX_CATCHUP_STEPS:
+                self.update()
+                lag -= step_ms
+                steps += 1
+            if steps == MAX_CATCHUP_STEPS:
+                lag = 0
             self.draw()
-            self.clock.tick(FPS)
+            lag = max(0, lag + self.clock.tick(rate) - step_ms)
         
-        pygame.quit()
+        close_window()
+
+def positive_float(text):
+    # argparse type for sizes that must be above zero
+    value = float(text)
+    if not value > 0:
+        raise argparse.ArgumentTypeError("must be above zero, got %s" % text)
+    return value
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="TikTok Followers Marble Race")
+    parser.add_argument("--headless", action="store_true",
+                        help="simulate the race without a window and print the result")
+    parser.add_argument("--engine", choices=["python", "numpy"], default="python",
+                        help="physics engine")
+    parser.add_argument("--seed", type=int, default=None, help="random seed for the race")
+    parser.add_argument("--max-ticks", type=int, default=60 * FPS,
+                        help="headless tick limit")
+    parser.add_argument("--time-step", type=positive_float, default=1,
+                        help="frames of 1/%d s simulated per tick, e.g. 2 for half the ticks" % FPS)
+    parser.add_argument("--max-speed", type=positive_float, default=MAX_SPEED,
+                        help="marble speed cap in px per frame")
+    parser.add_argument("--profile", metavar="PATH",
+                        help="with --headless, export per-frame timings as JSON or CSV")
+    parser.add_argument("--followers", metavar="PATH",
+                        help="CSV or JSONL follower export to race instead of the samples")
+    parser.add_argument("--sample", type=int, default=None,
+                        help="race N followers picked at random from --followers")
+    parser.add_argument("--limit", type=int, default=None,
+                        help="race the first N followers from --followers")
+    parser.add_argument("--export", metavar="PATH",
+                        help="render the race offline to a video file via ffmpeg, "
+                             "or to a PNG sequence when PATH has no extension")
+    parser.add_argument("--ffmpeg", default="ffmpeg", help="ffmpeg executable for --export")
+    parser.add_argument("--record", metavar="PATH", help="record the race to a replay file")
+    parser.add_argument("--replay", metavar="PATH",
+                        help="play back a recorded race, or re-render it with --export")
+    parser.add_argument("--live", metavar="PORT", type=int, nargs="?", const=LIVE_PORT,
+                        help="drop in followers sent as events to this local TCP port "
+                             "(see live.py for the format and a test sender)")
+    args = parser.parse_args()
+    if args.live is not None and (args.headless or args.export or args.replay or args.record):
+        parser.error("--live only works in an interactive race without --record or --replay")
+    return args
 
 if __name__ == "__main__":
+    args = parse_args()
+    
+    followers = None
+    if args.followers:
+        from followers import load_followers
+        followers = load_followers(args.followers, sample=args.sample,
+                                   limit=args.limit, seed=args.seed)
+        if followers.skipped:
+            print(f"Skipped {followers.skipped} rows of {args.followers} with no follower name",
+                  file=sys.stderr)
+    
+    replay = None
+    if args.replay:
+        from replay import Recording
+        replay = Recording(args.replay)
+    
+    if args.export:
+        from export import export_race
+        started = time.perf_counter()
+        frames = export_race(args.export, engine=args.engine, seed=args.seed,
+                             max_ticks=args.max_ticks, ffmpeg=args.ffmpeg,
+                             followers=followers, record=args.record, replay=replay,
+                             time_step=args.time_step, max_speed=args.max_speed)
+        elapsed = time.perf_counter() - started
+        time_step = FPS / replay.fps if replay is not None else args.time_step
+        print(f"Exported {frames} frames ({frames * time_step / FPS:.1f}s of video) "
+              f"in {elapsed:.1f}s to {args.export}")
+        raise SystemExit(0)
+    
+    if args.headless:
+        started = time.perf_counter()
+        game = MarbleRaceGame(engine=args.engine, headless=True, seed=args.seed,
+                              followers=followers, profile=bool(args.profile),
+                              time_step=args.time_step, max_speed=args.max_speed)
+        if args.record:
+            from replay import RaceRecorder
+            RaceRecorder(args.record, game)
+        results = game.run_headless(max_ticks=args.max_ticks)
+        if game.recorder is not None:
+            game.recorder.close(game)
+        if args.profile:
+            game.profiler.export(args.profile)
+            # The whole race, as exported, not just the overlay's recent window
+            profiler = game.profiler
+            frame = profiler.summary(profiler.log if profiler.record else None)['frame']
+            print(f"Tick time p50 {frame['p50_ms']:.3f} ms, p95 {frame['p95_ms']:.3f} ms, "
+                  f"p99 {frame['p99_ms']:.3f} ms -> {args.profile}")
+        print(f"Race simulated in {time.perf_counter() - started:.3f}s "
+              f"({results['ticks']} ticks, {results['seconds']:.1f}s race time)")
+        for place, finisher in enumerate(results['finish_order'][:3], start=1):
+            print(f"{place}. {finisher['name']} (tick {finisher['finish_tick']})")
+        raise SystemExit(0)
+    
     print("TikTok Followers Marble Race Game - Vertical Format")
     print("="*50)
     print("Format: 9:16 vertical (405x720) - Perfect for TikTok!")
@@ -513,8 +1283,25 @@ if __name__ == "__main__":
     print("- Real-time leaderboard")
     print("\nControls:")
     print("- R: Restart race")
+    print("- F3: Toggle profiler overlay")
     print("- ESC: Quit game")
     print("="*50)
     
-    game = MarbleRaceGame()
-    game.run()
\ No newline at end of file
+    if replay is not None:
+        from replay import ReplayGame
+        game = ReplayGame(replay)
+    else:
+        game = MarbleRaceGame(engine=args.engine, seed=args.seed, followers=followers,
+                              time_step=args.time_step, max_speed=args.max_speed)
+        if args.live is not None:
+            from live import LiveEventServer
+            game.live = LiveEventServer(port=args.live).start()
+            print(f"Listening for live events on {game.live.host}:{game.live.port}")
+        if args.record:
+            from replay import RaceRecorder
+            RaceRecorder(args.record, game)
+    game.run()
+    if game.recorder is not None:
+        game.recorder.close(game)
+    if game.live is not None:
+        game.live.stop()
\ No newline at end of file
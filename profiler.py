@@ -0,0 +1,85 @@
+import csv
+import json
+from collections import deque
+from time import perf_counter_ns
+
+PHASES = ("marbles", "camera", "ranking", "draw")
+PROFILE_WINDOW = 600  # Frames kept for the rolling percentiles (10s at 60 FPS)
+
+
+def percentile(sorted_values, q):
+    # Nearest-rank percentile of an already sorted list
+    if not sorted_values:
+        return 0
+    rank = max(0, min(len(sorted_values) - 1, round(q / 100 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+class FrameProfiler:
+    # Per-phase frame timings with perf_counter_ns. Callers check `enabled`
+    # before timing anything, so a disabled profiler costs one attribute read
+    # per phase.
+
+    def __init__(self, enabled=False, record=False, window=PROFILE_WINDOW):
+        self.enabled = enabled
+        self.record = record  # Keep every frame for export, not just the window
+        self.current = dict.fromkeys(PHASES, 0)
+        self.collision_tests = 0
+        self.history = deque(maxlen=window)
+        self.log = []
+
+    def add(self, phase, start_ns):
+        # Charge the time since start_ns to a phase and return the new start
+        now = perf_counter_ns()
+        self.current[phase] += now - start_ns
+        return now
+
+    def count_tests(self, count):
+        self.collision_tests += count
+
+    def end_frame(self):
+        phases = tuple(self.current[phase] for phase in PHASES)
+        row = (sum(phases),) + phases + (self.collision_tests,)
+        self.history.append(row)
+        if self.record:
+            self.log.append(row)
+        self.current = dict.fromkeys(PHASES, 0)
+        self.collision_tests = 0
+
+    def summary(self, rows=None):
+        rows = self.history if rows is None else rows
+        columns = list(zip(*rows)) or [()] * (len(PHASES) + 2)
+        result = {'frames': len(rows)}
+        for name, values in zip(("frame",) + PHASES, columns):
+            values = sorted(values)
+            result[name] = {
+                f"p{q}_ms": percentile(values, q) / 1e6 for q in (50, 95, 99)
+            }
+            result[name]['mean_ms'] = sum(values) / len(values) / 1e6 if values else 0
+        tests = columns[-1]
+        result['collision_tests_per_frame'] = sum(tests) / len(tests) if tests else 0
+        return result
+
+    def overlay_lines(self):
+        summary = self.summary()
+        frame = summary['frame']
+        lines = [f"frame p50 {frame['p50_ms']:.2f} p95 {frame['p95_ms']:.2f} "
+                 f"p99 {frame['p99_ms']:.2f} ms"]
+        for phase in PHASES:
+            lines.append(f"{phase} {summary[phase]['mean_ms']:.2f} ms")
+        lines.append(f"tests/frame {summary['collision_tests_per_frame']:.0f}")
+        return lines
+
+    def export(self, path):
+        # JSON summary with the raw frames, or one CSV row per frame
+        rows = self.log if self.record else list(self.history)
+        header = ("frame_ns",) + tuple(f"{phase}_ns" for phase in PHASES) + ("collision_tests",)
+        if path.endswith(".csv"):
+            with open(path, "w", newline="") as f:
+                writer = csv.writer(f)
+                writer.writerow(header)
+                writer.writerows(rows)
+        else:
+            with open(path, "w") as f:
+                json.dump({'summary': self.summary(rows), 'columns': header,
+                           'frames': rows}, f, separators=(",", ":"))
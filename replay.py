@@ -0,0 +1,177 @@
+import sys
+import struct
+import zlib
+from array import array
+
+from main import MarbleRaceGame, Marble, FPS, MAZE_VERSION
+
+# File layout, little-endian:
+#   header     magic, signed seed, world height, ticks per second, marble
+#              count, maze density, maze generator version; the maze is
+#              regenerated from the seed, so only the same version replays
+#   followers  per marble: u16 name length, UTF-8 name, then RGB bytes for all
+#   frames     one zlib stream of i32 position deltas, x and y per marble per
+#              tick, quantized to 1/POSITION_SCALE px; frame 0 is the start
+#   footer     u32 ticks, i32 finish tick per marble, u32 count + finish order
+#   trailer    u64 offset of the footer
+MAGIC = b"MRR3"
+HEADER = struct.Struct("<4sqiHIdH")
+FOOTER_OFFSET = struct.Struct("<Q")
+POSITION_SCALE = 8
+READ_SIZE = 1 << 16
+
+
+def _little_endian(values):
+    if sys.byteorder == "big":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values
+
+
+def _read_array(f, typecode, count):
+    values = array(typecode)
+    values.frombytes(f.read(values.itemsize * count))
+    return _little_endian(values)
+
+
+class RaceRecorder:
+    # Streams a race to disk as it runs; attach before the first update
+
+    def __init__(self, path, game):
+        # Pack the header first, so a race that can't be recorded leaves no file
+        try:
+            header = HEADER.pack(MAGIC, game.seed, game.world_height,
+                                 round(FPS / game.time_step), len(game.marbles),
+                                 game.maze_density, MAZE_VERSION)
+        except struct.error as error:
+            raise ValueError(f"Race with seed {game.seed} can't be recorded: {error}") from None
+        self.file = open(path, "wb")
+        self.compressor = zlib.compressobj(6)
+        self.file.write(header)
+        for marble in game.marbles:
+            name = marble.follower_name.encode("utf-8")
+            self.file.write(struct.pack("<H", len(name)) + name)
+        self.file.write(bytes(c for marble in game.marbles for c in marble.color))
+
+        self.previous = array("i", bytes(8 * len(game.marbles)))
+        self.capture(game)
+        game.recorder = self
+
+    def capture(self, game):
+        # Positions are quantized, then stored as the change since last tick
+        current = array("i", [round(value * POSITION_SCALE) for marble in game.marbles
+                              for value in (marble.x, marble.y)])
+        delta = array("i", [now - before for now, before in zip(current, self.previous)])
+        self.file.write(self.compressor.compress(_little_endian(delta).tobytes()))
+        self.previous = current
+
+    def close(self, game):
+        self.file.write(self.compressor.flush())
+        footer_offset = self.file.tell()
+        finish_ticks = array("i", [-1 if m.finish_time is None else m.finish_time
+                                   for m in game.marbles])
+        order = array("I", game.finish_order)
+        self.file.write(struct.pack("<I", game.tick))
+        self.file.write(_little_endian(finish_ticks).tobytes())
+        self.file.write(struct.pack("<I", len(order)) + _little_endian(order).tobytes())
+        self.file.write(FOOTER_OFFSET.pack(footer_offset))
+        self.file.close()
+        game.recorder = None
+
+
+class Recording:
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            header = f.read(HEADER.size)
+            if header[:len(MAGIC)] != MAGIC or len(header) < HEADER.size:
+                raise ValueError(f"{path} is not a marble race recording of this version")
+            magic, self.seed, self.world_height, self.fps, count, self.density, maze_version = \
+                HEADER.unpack(header)
+            if maze_version != MAZE_VERSION:
+                raise ValueError(f"{path} was recorded with maze version {maze_version}, "
+                                 f"this is version {MAZE_VERSION}")
+            self.names = []
+            for _ in range(count):
+                length, = struct.unpack("<H", f.read(2))
+                self.names.append(f.read(length).decode("utf-8"))
+            rgb = f.read(3 * count)
+            self.colors = [tuple(rgb[i:i + 3]) for i in range(0, len(rgb), 3)]
+            self.frames_offset = f.tell()
+
+            f.seek(-FOOTER_OFFSET.size, 2)
+            footer_offset, = FOOTER_OFFSET.unpack(f.read(FOOTER_OFFSET.size))
+            self.frames_end = footer_offset
+            f.seek(footer_offset)
+            self.ticks, = struct.unpack("<I", f.read(4))
+            self.finish_ticks = _read_array(f, "i", count)
+            order_count, = struct.unpack("<I", f.read(4))
+            self.finish_order = list(_read_array(f, "I", order_count))
+
+    def frames(self):
+        # Absolute quantized positions per tick, decompressed as they're read
+        frame_size = 8 * len(self.names)
+        decompressor = zlib.decompressobj()
+        positions = array("i", bytes(frame_size))
+        pending = bytearray()
+        with open(self.path, "rb") as f:
+            f.seek(self.frames_offset)
+            remaining = self.frames_end - self.frames_offset
+            while True:
+                while len(pending) < frame_size and remaining > 0:
+                    chunk = f.read(min(READ_SIZE, remaining))
+                    remaining -= len(chunk)
+                    pending += decompressor.decompress(chunk)
+                    if remaining == 0:
+                        pending += decompressor.flush()
+                if len(pending) < frame_size:
+                    return
+                delta = _little_endian(array("i", pending[:frame_size]))
+                del pending[:frame_size]
+                positions = array("i", [a + b for a, b in zip(positions, delta)])
+                yield positions
+
+
+class ReplayGame(MarbleRaceGame):
+    # Plays a recording back through the normal camera, HUD and renderer,
+    # without running any physics
+
+    def __init__(self, recording, headless=False):
+        self.recording = recording
+        self.frames = recording.frames()
+        super().__init__(headless=headless, seed=recording.seed,
+                         world_height=recording.world_height,
+                         maze_density=recording.density, time_step=FPS / recording.fps)
+
+    def create_marbles(self, followers=None):
+        start = next(self.frames)
+        for i, (name, color) in enumerate(zip(self.recording.names, self.recording.colors)):
+            marble = Marble(start[2 * i] / POSITION_SCALE, start[2 * i + 1] / POSITION_SCALE,
+                            name, color, self.marble_rng)
+            self.marbles.append(marble)
+
+    def update_marbles(self):
+        # Past the end of the recording the marbles hold their last position
+        positions = next(self.frames, None)
+        if positions is None:
+            return []
+        finish_ticks = self.recording.finish_ticks
+        finished_now = []
+        leader = None
+        for index in self.racing:
+            marble = self.marbles[index]
+            marble.x = positions[2 * index] / POSITION_SCALE
+            marble.y = positions[2 * index + 1] / POSITION_SCALE
+            if finish_ticks[index] == self.tick:
+                marble.finished = True
+                marble.finish_time = self.tick
+                finished_now.append(index)
+            elif leader is None or marble.y > leader.y:
+                leader = marble
+        self.leader = leader
+        if finished_now:
+            self.racing = [i for i in self.racing if not self.marbles[i].finished]
+        return finished_now
+
+    def new_race(self):
+        return ReplayGame(Recording(self.recording.path), headless=True)
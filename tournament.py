@@ -0,0 +1,411 @@
+import os
+import sys
+import json
+import math
+import time
+import random
+import argparse
+from array import array
+from multiprocessing import Process, Barrier, Value
+from multiprocessing.shared_memory import SharedMemory
+from threading import BrokenBarrierError
+
+import pygame
+
+from main import (MarbleRaceGame, Marble, ChunkedMaze, MazeLayer, MarbleRenderer, TextCache,
+                  open_window, close_window, load_font, load_background, positive_float, SAMPLE_FOLLOWERS,
+                  SCREEN_WIDTH, SCREEN_HEIGHT, WORLD_HEIGHT, FPS, MAX_SPEED, WHITE, BLACK, GREEN, YELLOW)
+
+# Per frame buffer: tick, camera y, leader y (-1 when nobody is racing),
+# finished count, then x and y per marble
+STATE_FIELDS = 4
+TOURNAMENT_ROW_LANES = 4  # Lanes side by side before the grid wraps
+LANE_TIMEOUT = 10  # Seconds a lane may take for one tick before it counts as dead
+
+
+class LaneState:
+    # One lane's shared memory block, laid out as
+    #   frames   two float64 frame buffers, written alternately by the worker
+    #   order    i32 finish order, append-only
+    #   colors   RGB bytes per marble, written once before the race starts
+    # While the compositor reads one frame buffer the worker fills the other,
+    # so neither side copies or waits on the other within a frame.
+
+    def __init__(self, count, name=None):
+        self.count = count
+        frame_size = 8 * (STATE_FIELDS + 2 * count)
+        size = 2 * frame_size + 4 * count + 3 * count
+        if name is None:
+            self.shm = SharedMemory(create=True, size=size)
+        else:
+            self.shm = SharedMemory(name=name)
+        buf = self.shm.buf
+        self.frames = [buf[i * frame_size:(i + 1) * frame_size].cast("d") for i in (0, 1)]
+        self.order = buf[2 * frame_size:2 * frame_size + 4 * count].cast("i")
+        self.colors = buf[2 * frame_size + 4 * count:size]
+        self.written = 0  # Finish order entries published so far
+
+    def publish(self, game, frame):
+        # Copy the lane's tick into frame buffer 0 or 1
+        count = self.count
+        values = self.frames[frame]
+        leader_y = -1 if game.leader is None else game.leader.y
+        values[:STATE_FIELDS] = array("d", [game.tick, game.camera.y, leader_y,
+                                            len(game.finish_order)])
+        if game.physics is not None:
+            values[STATE_FIELDS:STATE_FIELDS + count] = game.physics.x
+            values[STATE_FIELDS + count:] = game.physics.y
+        else:
+            values[STATE_FIELDS:STATE_FIELDS + count] = array("d", [m.x for m in game.marbles])
+            values[STATE_FIELDS + count:] = array("d", [m.y for m in game.marbles])
+        finished = len(game.finish_order)
+        if finished > self.written:
+            self.order[self.written:finished] = array("i", game.finish_order[self.written:])
+            self.written = finished
+
+    def close(self, unlink=False):
+        # Views must be released before the block can be closed
+        for view in self.frames:
+            view.release()
+        self.order.release()
+        self.colors.release()
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+
+
+def run_lane(name, followers, seed, engine, world_height, maze_density, time_step,
+             max_speed, max_ticks, qualifiers, barrier=None, stop=None):
+    # Runs in a worker process. Headless lanes race until their qualifiers
+    # are known; shown lanes advance one tick per composited frame.
+    state = LaneState(len(followers), name)
+    try:
+        game = MarbleRaceGame(engine=engine, headless=True, seed=seed, followers=followers,
+                              world_height=world_height, maze_density=maze_density,
+                              time_step=time_step, max_speed=max_speed)
+        state.colors[:] = bytes(c for marble in game.marbles for c in marble.color)
+        if stop is None:
+            target = min(qualifiers, len(game.marbles))
+            while game.tick < max_ticks and len(game.finish_order) < target:
+                game.update()
+            state.publish(game, 0)
+            return
+        state.publish(game, 0)
+        rounds = 0
+        while True:
+            # Tick t is read from buffer t % 2 while tick t + 1 is written.
+            # stop names the last barrier round rather than being a flag, as
+            # a lane woken late from one round could see a flag meant for the
+            # next and leave the compositor waiting for it.
+            barrier.wait()
+            if rounds == stop.value:
+                break
+            rounds += 1
+            game.update()
+            state.publish(game, game.tick % 2)
+    except BrokenBarrierError:
+        pass  # The compositor or another lane went away
+    except BaseException:
+        # Wake the compositor and the other lanes instead of leaving them waiting
+        if barrier is not None:
+            barrier.abort()
+        raise
+    finally:
+        state.close()
+
+
+def default_lanes():
+    # One lane per core, leaving a core for the compositor
+    return max(1, (os.cpu_count() or 1) - 1)
+
+
+def split_brackets(followers, lanes):
+    # Round-robin, so brackets differ in size by at most one follower
+    followers = list(followers)
+    return [followers[lane::lanes] for lane in range(lanes)]
+
+
+def sample_followers(count):
+    names = len(SAMPLE_FOLLOWERS)
+    return [(SAMPLE_FOLLOWERS[i % names] + (f"_{i // names}" if i >= names else ""), None)
+            for i in range(count)]
+
+
+class Lane:
+    # The compositor's side of a lane: the shared state plus what it takes
+    # to draw it, without any physics
+
+    def __init__(self, index, followers, seed, world_height, maze_density):
+        self.index = index
+        self.seed = seed
+        self.followers = followers
+        self.world_height = world_height
+        self.state = LaneState(len(followers))
+        self.maze = ChunkedMaze(seed, world_height, maze_density)
+        self.marbles = None
+
+    def results(self, qualifiers, frame=0):
+        values = self.state.frames[frame]
+        finished = int(values[3])
+        order = self.state.order[:finished].tolist()
+        return {
+            'lane': self.index,
+            'seed': self.seed,
+            'ticks': int(values[0]),
+            'qualifiers': [{'name': self.followers[slot][0], 'slot': slot}
+                           for slot in order[:qualifiers]],
+        }
+
+    def setup_rendering(self, font, text_cache, scale):
+        # Colours are only known once the worker has created its marbles.
+        # The lane is drawn straight at its cell size, shrunk by scale.
+        colors = self.state.colors
+        self.marbles = [Marble(0, 0, name, tuple(colors[3 * i:3 * i + 3]))
+                        for i, (name, _) in enumerate(self.followers)]
+        self.font = font
+        self.text_cache = text_cache
+        self.scale = scale
+        self.maze_layer = MazeLayer(self.maze, font, self.world_height, scale)
+        self.marble_renderer = MarbleRenderer(font, text_cache, scale)
+
+    def render(self, surface, background, frame):
+        values = self.state.frames[frame]
+        tick, camera_y, leader_y, finished = values[:STATE_FIELDS]
+        count = self.state.count
+        xs = values[STATE_FIELDS:STATE_FIELDS + count]
+        ys = values[STATE_FIELDS + count:]
+        self.maze.drop_above(camera_y - SCREEN_HEIGHT)
+
+        surface.blit(background, (0, 0))
+        self.maze_layer.draw(surface, camera_y)
+        top = camera_y - 50
+        bottom = camera_y + SCREEN_HEIGHT + 50
+        visible = [(slot, x, y, marble.radius)
+                   for slot, (x, y, marble) in enumerate(zip(xs, ys, self.marbles))
+                   if top <= y <= bottom]
+        self.marble_renderer.draw(surface, self.marbles, visible, camera_y)
+
+        # Lane number and its podium so far
+        lines = [f"Lane {self.index + 1}"]
+        lines += [f"{place}. {self.followers[slot][0][:8]}"
+                  for place, slot in enumerate(self.state.order[:min(int(finished), 3)], start=1)]
+        line_height = self.font.get_linesize() + 5
+        for i, line in enumerate(lines):
+            text = self.text_cache.render(line, self.font, YELLOW if i == 0 else WHITE)
+            text_bg = pygame.Rect(5, 5 + i * line_height, text.get_width() + 10, text.get_height() + 5)
+            pygame.draw.rect(surface, BLACK, text_bg)
+            surface.blit(text, (10, 8 + i * line_height))
+
+        if leader_y >= 0:
+            progress = min(leader_y / self.world_height, 1.0)
+            scale = self.scale
+            bar_x = round(10 * scale)
+            bar_y = surface.get_height() - round(30 * scale)
+            bar_width = surface.get_width() - 2 * bar_x
+            bar_height = max(2, round(8 * scale))
+            pygame.draw.rect(surface, (100, 100, 100), (bar_x, bar_y, bar_width, bar_height))
+            pygame.draw.rect(surface, GREEN, (bar_x, bar_y, bar_width * progress, bar_height))
+
+    def close(self):
+        self.state.close(unlink=True)
+
+
+class Tournament:
+    # Runs one lane per worker process and composites them in a grid; the
+    # main process only draws and never steps any physics
+
+    def __init__(self, followers, lanes=None, engine="python", seed=None,
+                 world_height=WORLD_HEIGHT, maze_density=1.0, time_step=1,
+                 max_speed=MAX_SPEED, qualifiers=1):
+        lanes = lanes or default_lanes()
+        self.brackets = [bracket for bracket in split_brackets(followers, lanes) if bracket]
+        # Lane i races seed + i; one shared seed would give every lane the
+        # same course and start kicks, so the same slots would always win
+        self.seed = seed if seed is not None else random.randrange(2 ** 32)
+        self.engine = engine
+        self.world_height = world_height
+        self.maze_density = maze_density
+        self.time_step = time_step
+        self.max_speed = max_speed
+        self.qualifiers = qualifiers
+        self.lanes = [Lane(index, bracket, self.seed + index, world_height, maze_density)
+                      for index, bracket in enumerate(self.brackets)]
+        self.workers = []
+
+    def start(self, max_ticks, barrier=None, stop=None):
+        for lane in self.lanes:
+            worker = Process(target=run_lane, name=f"lane-{lane.index}", daemon=True,
+                             args=(lane.state.shm.name, lane.followers, lane.seed, self.engine,
+                                   self.world_height, self.maze_density, self.time_step,
+                                   self.max_speed, max_ticks, self.qualifiers, barrier, stop))
+            worker.start()
+            self.workers.append(worker)
+
+    def run_headless(self, max_ticks=60 * FPS):
+        # Every lane races flat out on its own core until its qualifiers finish
+        self.start(max_ticks)
+        for worker in self.workers:
+            worker.join()
+        self.check_workers()
+        return self.results()
+
+    def check_workers(self):
+        failed = [worker.name for worker in self.workers if worker.exitcode not in (None, 0)]
+        if failed:
+            raise RuntimeError(f"Tournament lanes failed: {', '.join(failed)}")
+
+    def wait(self, barrier):
+        # A lane that crashes breaks the barrier; one that hangs or is killed
+        # outright never arrives, and the timeout breaks it instead
+        try:
+            barrier.wait(LANE_TIMEOUT)
+        except BrokenBarrierError:
+            for worker in self.workers:
+                worker.join(LANE_TIMEOUT)
+            self.check_workers()
+            raise RuntimeError("A tournament lane stopped responding") from None
+
+    def results(self, frame=0):
+        return {
+            'seed': self.seed,
+            'lanes': [lane.results(self.qualifiers, frame) for lane in self.lanes],
+        }
+
+    def run(self):
+        # Workers start before the window opens, so none inherits a display
+        barrier = Barrier(len(self.lanes) + 1)
+        stop = Value("q", -1)  # Barrier round the workers stop after, once known
+        self.start(None, barrier, stop)
+
+        rows = math.ceil(math.sqrt(len(self.lanes) / TOURNAMENT_ROW_LANES))
+        columns = math.ceil(len(self.lanes) / rows)
+        cell_height = SCREEN_HEIGHT // rows
+        cell_width = cell_height * SCREEN_WIDTH // SCREEN_HEIGHT
+        screen = open_window((columns * cell_width, rows * cell_height),
+                             "TikTok Followers Marble Race - Tournament")
+        clock = pygame.time.Clock()
+        # Lanes are drawn straight into their cells, which costs a fraction
+        # of drawing them full size and scaling each one down every frame
+        scale = cell_height / SCREEN_HEIGHT
+        font = load_font(max(10, round(20 * scale)))
+        big_font = load_font(32)
+        text_cache = TextCache()
+        background = pygame.transform.smoothscale(load_background(), (cell_width, cell_height))
+        cells = [screen.subsurface((index % columns * cell_width, index // columns * cell_height,
+                                    cell_width, cell_height))
+                 for index in range(len(self.lanes))]
+
+        frame = 0
+        running = True
+        try:
+            while running:
+                for event in pygame.event.get():
+                    if event.type == pygame.QUIT:
+                        running = False
+                    elif event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE:
+                        running = False
+
+                # Tick `frame` is complete; the workers compute the next one
+                # while this one is drawn
+                self.wait(barrier)
+                decided = 0
+                for index, lane in enumerate(self.lanes):
+                    if lane.marbles is None:
+                        lane.setup_rendering(font, text_cache, scale)
+                    lane.render(cells[index], background, frame % 2)
+                    finished = int(lane.state.frames[frame % 2][3])
+                    if finished >= min(self.qualifiers, lane.state.count):
+                        decided += 1
+
+                elapsed_time = frame * self.time_step / FPS
+                text = text_cache.render(f"Time: {elapsed_time:.1f}s  Lanes decided: "
+                                         f"{decided}/{len(self.lanes)}", big_font, WHITE)
+                text_bg = pygame.Rect(0, screen.get_height() - text.get_height() - 10,
+                                      text.get_width() + 20, text.get_height() + 10)
+                pygame.draw.rect(screen, BLACK, text_bg)
+                screen.blit(text, (10, text_bg.y + 5))
+                pygame.display.flip()
+                frame += 1
+                clock.tick(FPS / self.time_step)
+            # The last tick started is complete once the workers stop
+            stop.value = frame
+            self.wait(barrier)
+            results = self.results(frame % 2)
+        except BaseException:
+            barrier.abort()
+            raise
+        finally:
+            for worker in self.workers:
+                worker.join(LANE_TIMEOUT)
+                if worker.is_alive():
+                    worker.terminate()
+            close_window()
+        return results
+
+    def close(self):
+        for lane in self.lanes:
+            lane.close()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Race brackets of followers in parallel lanes")
+    parser.add_argument("--headless", action="store_true",
+                        help="race every lane flat out and print the qualifiers")
+    parser.add_argument("--lanes", type=int, default=None,
+                        help="parallel lanes, each in its own process (default: one per core but one)")
+    parser.add_argument("--followers", metavar="PATH",
+                        help="CSV or JSONL follower export to split into brackets")
+    parser.add_argument("--sample", type=int, default=None,
+                        help="race N followers picked at random from --followers")
+    parser.add_argument("--limit", type=int, default=None,
+                        help="race the first N followers from --followers")
+    parser.add_argument("--per-lane", type=int, default=12,
+                        help="sample followers per lane when no --followers are given")
+    parser.add_argument("--qualifiers", type=int, default=1,
+                        help="finishers per lane who go through")
+    parser.add_argument("--engine", choices=["python", "numpy"], default="python",
+                        help="physics engine")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="random seed of the first lane, the others count up from it")
+    parser.add_argument("--max-ticks", type=int, default=60 * FPS,
+                        help="headless tick limit per lane")
+    parser.add_argument("--time-step", type=positive_float, default=1,
+                        help="frames of 1/%d s simulated per tick" % FPS)
+    parser.add_argument("--output", metavar="PATH", help="write the qualifiers as JSON")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    lanes = args.lanes or default_lanes()
+    if args.followers:
+        from followers import load_followers
+        followers = load_followers(args.followers, sample=args.sample,
+                                   limit=args.limit, seed=args.seed)
+        if followers.skipped:
+            print(f"Skipped {followers.skipped} rows of {args.followers} with no follower name",
+                  file=sys.stderr)
+    else:
+        followers = sample_followers(lanes * args.per_lane)
+
+    tournament = Tournament(followers, lanes=lanes, engine=args.engine, seed=args.seed,
+                            time_step=args.time_step, qualifiers=args.qualifiers)
+    started = time.perf_counter()
+    try:
+        if args.headless:
+            results = tournament.run_headless(max_ticks=args.max_ticks)
+        else:
+            results = tournament.run()
+    finally:
+        tournament.close()
+    elapsed = time.perf_counter() - started
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.headless:
+        print(f"{len(tournament.lanes)} lanes of {len(followers)} followers raced "
+              f"in {elapsed:.1f}s (seed {results['seed']})")
+    for lane in results['lanes']:
+        names = ", ".join(q['name'] for q in lane['qualifiers']) or "-"
+        print(f"Lane {lane['lane'] + 1} (tick {lane['ticks']}): {names}")
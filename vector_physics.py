@@ -0,0 +1,401 @@
+import numpy as np
+
+from main import (
+    Marble, SCREEN_WIDTH, WORLD_HEIGHT, GRAVITY, FRICTION, BOUNCE_DAMPING,
+    MAX_SPEED, MAX_SUBSTEP, SLEEP_DISTANCE, SLEEP_FRAMES, SUPPORT_GAP, WAKE_DISTANCE,
+)
+
+
+def _expand_ranges(starts, counts):
+    # Flatten the half-open ranges [start, start + count) into one index array,
+    # returning it with the position of the range each entry came from
+    owners = np.repeat(np.arange(len(counts)), counts)
+    offsets = np.arange(owners.size) - np.repeat(np.cumsum(counts) - counts, counts)
+    return owners, starts[owners] + offsets
+
+
+def _entry_sides(x, y, vx, vy, px, py, left, top, right, bottom):
+    # Batched Marble.entry_side: which marbles have an entry side, with its
+    # outward normal and the centre's distance past it
+    ex = px - np.clip(px, left, right)
+    ey = py - np.clip(py, top, bottom)
+    entry = np.hypot(ex, ey)
+    outside = entry > 0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        nx = np.where(outside, ex / entry, 0.0)
+        ny = np.where(outside, ey / entry, 0.0)
+        # Already inside: trace back against the velocity to the nearest side
+        tx = np.where(vx > 0, (x - left) / vx, np.where(vx < 0, (x - right) / vx, np.inf))
+        ty = np.where(vy > 0, (y - top) / vy, np.where(vy < 0, (y - bottom) / vy, np.inf))
+    distance = (x - px + ex) * nx + (y - py + ey) * ny
+
+    along_x = ~outside & (tx < ty)
+    along_y = ~outside & ~along_x & (ty < np.inf)
+    nx[along_x] = np.where(vx[along_x] > 0, -1.0, 1.0)
+    distance[along_x] = np.where(vx > 0, left - x, x - right)[along_x]
+    ny[along_y] = np.where(vy[along_y] > 0, -1.0, 1.0)
+    distance[along_y] = np.where(vy > 0, top - y, y - bottom)[along_y]
+    return outside | along_x | along_y, nx, ny, distance
+
+
+class MarbleView(Marble):
+    # A Marble whose physical state lives in the VectorPhysics arrays
+
+    def __init__(self, engine, index, follower_name, color):
+        self.engine = engine
+        self.index = index
+        self.follower_name = follower_name
+        self.color = color
+        self.position_rank = None
+        self.label = None
+
+    def _field(name):
+        def get(self):
+            return getattr(self.engine, name)[self.index].item()
+
+        def set(self, value):
+            getattr(self.engine, name)[self.index] = value
+
+        return property(get, set)
+
+    x = _field('x')
+    y = _field('y')
+    vx = _field('vx')
+    vy = _field('vy')
+    radius = _field('radius')
+    finished = _field('finished')
+    sleeping = _field('sleeping')
+    still_frames = _field('still_frames')
+    rest_x = _field('rest_x')
+    rest_y = _field('rest_y')
+    del _field
+
+    @property
+    def finish_time(self):
+        value = self.engine.finish_time[self.index].item()
+        return None if value < 0 else value
+
+    def update(self, obstacles, other_marbles, tick=0, world_height=WORLD_HEIGHT,
+               dt=1, max_speed=MAX_SPEED):
+        raise RuntimeError("MarbleView is advanced by VectorPhysics.step()")
+
+
+class VectorPhysics:
+    # Structure-of-arrays engine that advances every marble per tick with
+    # batched NumPy operations. Obstacle hits follow Marble.update; marble
+    # pairs are resolved together from the same state instead of one after
+    # the other, so piles settle slightly differently from the Python engine.
+
+    def __init__(self, marbles, maze, seed=None, world_height=WORLD_HEIGHT,
+                 time_step=1, max_speed=MAX_SPEED):
+        self.rng = np.random.default_rng(seed)
+        self.time_step = time_step
+        self.max_speed = max_speed
+        self.finish_y = world_height - 100
+        self.x = np.array([m.x for m in marbles], dtype=np.float64)
+        self.y = np.array([m.y for m in marbles], dtype=np.float64)
+        self.vx = np.array([m.vx for m in marbles], dtype=np.float64)
+        self.vy = np.array([m.vy for m in marbles], dtype=np.float64)
+        self.radius = np.array([m.radius for m in marbles], dtype=np.float64)
+        self.finished = np.zeros(len(marbles), dtype=bool)
+        self.finish_time = np.full(len(marbles), -1, dtype=np.int64)
+        self.sleeping = np.zeros(len(marbles), dtype=bool)
+        self.still_frames = np.zeros(len(marbles), dtype=np.int32)
+        self.rest_x = self.x.copy()
+        self.rest_y = self.y.copy()
+        self.views = [MarbleView(self, i, m.follower_name, m.color)
+                      for i, m in enumerate(marbles)]
+
+        self.maze = maze
+        self.maze_version = None
+        self.collision_tests = 0  # Candidate pairs tested on the last step
+        self.leader = None  # Index of the furthest racing marble
+        self.trailing_y = None  # y of the highest racing marble
+
+    def load_maze(self):
+        # Copy the live obstacles in the maze's y order, remembering maze
+        # order for ties
+        maze = self.maze
+        order = np.array(maze.order, dtype=np.intp)
+        self.obstacle_order = order
+        self.ox = np.frombuffer(maze.x, dtype=np.intc)[order].astype(np.float64)
+        self.oy = np.frombuffer(maze.y, dtype=np.intc)[order].astype(np.float64)
+        self.ow = np.frombuffer(maze.width, dtype=np.intc)[order].astype(np.float64)
+        self.oh = np.frombuffer(maze.height, dtype=np.intc)[order].astype(np.float64)
+        self.max_height = maze.max_height
+        self.maze_version = maze.version
+
+    def add_marbles(self, marbles):
+        # Append a batch of Marbles mid-race, growing each array once
+        first = len(self.views)
+        count = len(marbles)
+        self.x = np.concatenate((self.x, [m.x for m in marbles]))
+        self.y = np.concatenate((self.y, [m.y for m in marbles]))
+        self.vx = np.concatenate((self.vx, [m.vx for m in marbles]))
+        self.vy = np.concatenate((self.vy, [m.vy for m in marbles]))
+        self.radius = np.concatenate((self.radius, [m.radius for m in marbles]))
+        self.finished = np.concatenate((self.finished, np.zeros(count, dtype=bool)))
+        self.finish_time = np.concatenate((self.finish_time, np.full(count, -1, dtype=np.int64)))
+        self.sleeping = np.concatenate((self.sleeping, np.zeros(count, dtype=bool)))
+        self.still_frames = np.concatenate((self.still_frames, np.zeros(count, dtype=np.int32)))
+        self.rest_x = np.concatenate((self.rest_x, self.x[first:]))
+        self.rest_y = np.concatenate((self.rest_y, self.y[first:]))
+        self.views.extend(MarbleView(self, first + i, m.follower_name, m.color)
+                          for i, m in enumerate(marbles))
+
+    def visible(self, top, bottom):
+        # (slot, x, y, radius) of the marbles with top <= y <= bottom
+        slots = np.flatnonzero((self.y >= top) & (self.y <= bottom))
+        return list(zip(slots.tolist(), self.x[slots].tolist(), self.y[slots].tolist(),
+                        self.radius[slots].astype(int).tolist()))
+
+    def step(self, tick=0):
+        # Advance one tick and return the indices that crossed the line
+        racing = np.flatnonzero(~self.finished)
+        if racing.size == 0:
+            self.leader = None
+            self.trailing_y = None
+            return []
+
+        # Generate the maze around the field, a tick of travel either way
+        y = self.y[racing]
+        reach = self.radius[racing].max() + self.max_speed * self.time_step
+        self.maze.cover(y.min() - reach, y.max() + reach)
+        if self.maze.version != self.maze_version:
+            self.load_maze()
+
+        asleep = self.sleeping[racing]
+        active = racing[~asleep]
+
+        # Gravity, friction and speed limit
+        dt = self.time_step
+        vx = self.vx[active] * FRICTION ** dt
+        vy = self.vy[active] + GRAVITY * dt
+        np.clip(vx, -self.max_speed, self.max_speed, out=vx)
+        np.clip(vy, -self.max_speed, self.max_speed, out=vy)
+        r = self.radius[active]
+        x = self.x[active]
+        y = self.y[active]
+
+        # Each marble moves in its own number of sub-steps, like Marble.update;
+        # later sub-steps only carry the marbles that still need them
+        steps = np.maximum(1, np.ceil(np.maximum(np.abs(vx), np.abs(vy)) * dt / MAX_SUBSTEP))
+        self.collision_tests = 0
+        for sub_step in range(int(steps.max()) if steps.size else 0):
+            moving = np.flatnonzero(steps > sub_step)
+            mx, my, mvx, mvy, mr = x[moving], y[moving], vx[moving], vy[moving], r[moving]
+            mx += mvx * dt / steps[moving]
+            my += mvy * dt / steps[moving]
+
+            # Bounce off screen edges
+            left = mx - mr <= 0
+            right = ~left & (mx + mr >= SCREEN_WIDTH)
+            mx[left] = mr[left]
+            mx[right] = SCREEN_WIDTH - mr[right]
+            mvx[left | right] *= -BOUNCE_DAMPING
+
+            hit = self._collide_obstacles(mx, my, mvx, mvy, mr, x[moving], y[moving])
+            x[moving], y[moving], vx[moving], vy[moving] = mx, my, mvx, mvy
+            self.x[active] = x
+            self.y[active] = y
+            self.vx[active] = vx
+            self.vy[active] = vy
+
+            # Marble pairs are resolved every sub-step so fast marbles can't
+            # pass through each other. Marbles that sleep, hit an obstacle in
+            # this sub-step or are done moving skip their own checks, but
+            # stay solid for the others
+            skipped = asleep.copy()
+            idle = np.ones(active.size, dtype=bool)
+            idle[moving[~hit]] = False
+            skipped[~asleep] = idle
+            self._collide_marbles(racing, skipped)
+            x, y = self.x[active], self.y[active]
+            vx, vy = self.vx[active], self.vy[active]
+
+        # Fall asleep once held in place for SLEEP_FRAMES ticks, like
+        # Marble.update; drifting marbles start a new still spell
+        still = ((np.abs(self.x[active] - self.rest_x[active]) <= SLEEP_DISTANCE)
+                 & (np.abs(self.y[active] - self.rest_y[active]) <= SLEEP_DISTANCE))
+        self._wake(active[~still])
+        self.still_frames[active[still]] += 1
+        for index in active[still][self.still_frames[active[still]] >= SLEEP_FRAMES].tolist():
+            # Few marbles get this far, so the obstacle test is Marble.held
+            view = self.views[index]
+            reach = view.radius + SUPPORT_GAP
+            view.sleeping = view.held(self.maze.overlapping(view.y - reach, view.y + reach))
+
+        # Finish line
+        y = self.y[racing]
+        crossing = y > self.finish_y
+        crossed = racing[crossing]
+        if crossed.size:
+            self.finished[crossed] = True
+            self.finish_time[crossed] = tick
+
+        still_racing = racing[~crossing]
+        self.leader = int(still_racing[np.argmax(y[~crossing])]) if still_racing.size else None
+        self.trailing_y = y[~crossing].min().item() if still_racing.size else None
+        return crossed.tolist()
+
+    def _wake(self, indices):
+        # Marble.wake for a batch of marbles
+        self.sleeping[indices] = False
+        self.still_frames[indices] = 0
+        self.rest_x[indices] = self.x[indices]
+        self.rest_y[indices] = self.y[indices]
+
+    def _collide_obstacles(self, x, y, vx, vy, r, px, py):
+        # Batched check_collision / handle_collision on the marbles in place,
+        # (px, py) being where each moved from;
+        # returns which marbles hit an obstacle this sub-step
+        lo = np.searchsorted(self.oy, y - r - self.max_height, side='left')
+        hi = np.searchsorted(self.oy, y + r, side='right')
+        owners, cand = _expand_ranges(lo, hi - lo)
+        self.collision_tests += cand.size
+        hit = np.zeros(x.size, dtype=bool)
+        if cand.size == 0:
+            return hit
+
+        cx = np.clip(x[owners], self.ox[cand], self.ox[cand] + self.ow[cand])
+        cy = np.clip(y[owners], self.oy[cand], self.oy[cand] + self.oh[cand])
+        touching = (x[owners] - cx) ** 2 + (y[owners] - cy) ** 2 < r[owners] ** 2
+        owners, cand = owners[touching], cand[touching]
+        if owners.size == 0:
+            return hit
+
+        # Like Marble.update, only the first obstacle in maze order counts
+        sort = np.lexsort((self.obstacle_order[cand], owners))
+        owners, cand = owners[sort], cand[sort]
+        first = np.ones(owners.size, dtype=bool)
+        first[1:] = owners[1:] != owners[:-1]
+        m, o = owners[first], cand[first]
+        hit[m] = True
+
+        mx, my, mr = x[m], y[m], r[m]
+        left, top = self.ox[o], self.oy[o]
+        right, bottom = left + self.ow[o], top + self.oh[o]
+        cx = np.clip(mx, left, right)
+        cy = np.clip(my, top, bottom)
+        dx = mx - cx
+        dy = my - cy
+        distance = np.hypot(dx, dy)
+
+        # Swept test: centres that went into or right through the obstacle
+        # are pushed back out on the side they came from
+        qx, qy = px[m], py[m]
+        crossed = np.flatnonzero((distance == 0) | (dx * (qx - cx) + dy * (qy - cy) < 0))
+        swept = np.zeros(m.size, dtype=bool)
+        if crossed.size:
+            c = crossed
+            found, sx, sy, sd = _entry_sides(mx[c], my[c], vx[m[c]], vy[m[c]], qx[c], qy[c],
+                                             left[c], top[c], right[c], bottom[c])
+            c = c[found]
+            swept[c] = True
+
+        # Marble is inside obstacle, push it out from the centre
+        inside = (distance == 0) & ~swept
+        if inside.any():
+            dx[inside] = mx[inside] - ((left + right) / 2)[inside]
+            dy[inside] = my[inside] - ((top + bottom) / 2)[inside]
+            distance[inside] = np.maximum(1, np.hypot(dx[inside], dy[inside]))
+
+        nx = np.divide(dx, distance, out=np.zeros_like(dx), where=~swept)
+        ny = np.divide(dy, distance, out=np.zeros_like(dy), where=~swept)
+        if crossed.size:
+            nx[c], ny[c], distance[c] = sx[found], sy[found], sd[found]
+        push = np.maximum(mr - distance, 0)
+        push[push > 0] += 1
+        x[m] = mx + nx * push
+        y[m] = my + ny * push
+
+        dot = vx[m] * nx + vy[m] * ny
+        into = dot < 0
+        mi = m[into]
+        vx[mi] -= 2 * dot[into] * nx[into] * BOUNCE_DAMPING
+        vy[mi] -= 2 * dot[into] * ny[into] * BOUNCE_DAMPING
+        vx[mi] += self.rng.uniform(-0.3, 0.3, mi.size)
+        vy[mi] += self.rng.uniform(-0.1, 0.1, mi.size)
+        return hit
+
+    def _collide_marbles(self, active, skipped):
+        # Grid broad phase: positions are settled for the sub-step, so cells
+        # only need to cover one contact distance, plus the wake distance, and
+        # each cell is matched with itself and the four neighbours ahead of it
+        x = self.x[active]
+        y = self.y[active]
+        r = self.radius[active]
+        cell = 2 * r.max() + WAKE_DISTANCE
+        gx = (x // cell).astype(np.intp) + 1
+        gy = (y // cell).astype(np.intp)
+        gy -= gy.min()
+        columns = gx.max() + 2
+        keys = gy * columns + gx
+        order = np.argsort(keys, kind='stable')
+        counts = np.bincount(keys, minlength=(gy.max() + 2) * columns)
+        starts = np.concatenate(([0], np.cumsum(counts)))
+
+        firsts, seconds = [], []
+        for offset in (0, 1, columns - 1, columns, columns + 1):
+            target = keys + offset
+            lo = starts[target]
+            owners, found = _expand_ranges(lo, starts[target + 1] - lo)
+            other = order[found]
+            if offset == 0:
+                keep = owners < other
+                owners, other = owners[keep], other[keep]
+            firsts.append(owners)
+            seconds.append(other)
+        i = np.concatenate(firsts)
+        j = np.concatenate(seconds)
+        self.collision_tests += i.size
+
+        dx = x[i] - x[j]
+        dy = y[i] - y[j]
+        distance = np.hypot(dx, dy)
+        min_distance = r[i] + r[j]
+
+        # An awake marble coming close wakes a sleeping one, and so does a bump
+        sleeping = self.sleeping[active]
+        near = distance < min_distance + WAKE_DISTANCE
+        self._wake(active[i[near & sleeping[i] & ~sleeping[j]]])
+        self._wake(active[j[near & sleeping[j] & ~sleeping[i]]])
+        # A marble that hit an obstacle or sleeps skips its own marble checks,
+        # so a pair is resolved unless both marbles skipped
+        touching = (distance < min_distance) & ~(skipped[i] & skipped[j])
+        i, j = i[touching], j[touching]
+        if i.size == 0:
+            return
+        self._wake(active[np.concatenate((i, j))])
+        dx, dy, distance = dx[touching], dy[touching], distance[touching]
+        min_distance = min_distance[touching]
+
+        # Marbles exactly on top of each other are separated at random
+        stacked = distance == 0
+        if stacked.any():
+            angle = self.rng.uniform(0, 2 * np.pi, stacked.sum())
+            dx[stacked] = np.cos(angle)
+            dy[stacked] = np.sin(angle)
+            distance[stacked] = 0.1
+
+        nx = dx / distance
+        ny = dy / distance
+        separation = (min_distance - distance) * 0.5 + 1
+        n = active.size
+        shift_x = (np.bincount(i, nx * separation, n)
+                   - np.bincount(j, nx * separation, n))
+        shift_y = (np.bincount(i, ny * separation, n)
+                   - np.bincount(j, ny * separation, n))
+
+        vx = self.vx[active]
+        vy = self.vy[active]
+        dvn = (vx[i] - vx[j]) * nx + (vy[i] - vy[j]) * ny
+        # Do not resolve if velocities are separating
+        impulse = np.where(dvn <= 0, dvn * 0.9, 0)
+        dvx = np.bincount(j, impulse * nx, n) - np.bincount(i, impulse * nx, n)
+        dvy = np.bincount(j, impulse * ny, n) - np.bincount(i, impulse * ny, n)
+
+        self.x[active] = np.clip(x + shift_x, r, SCREEN_WIDTH - r)
+        self.y[active] = y + shift_y
+        self.vx[active] = vx + dvx
+        self.vy[active] = vy + dvy